@@ -0,0 +1,57 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ktp.passwords import PasswordHasher  # noqa: E402
+
+# 비용 설정별 초당 로그인 검증 수. 동시에 몰리는 로그인 요청을 clients 개 스레드로 흉내 낸다
+#   python benchmarks/bench_login.py --clients 16 --logins 64 --workers 2
+
+SETTINGS = [
+    ('scrypt', {'scrypt_n': 2 ** 12}),
+    ('scrypt', {'scrypt_n': 2 ** 14}),
+    ('scrypt', {'scrypt_n': 2 ** 15}),
+    ('pbkdf2_sha256', {'pbkdf2_iterations': 100_000}),
+    ('pbkdf2_sha256', {'pbkdf2_iterations': 600_000}),
+]
+PASSWORD = 'correct horse battery staple'
+
+
+def bench(hasher, stored, clients, logins):
+    with ThreadPoolExecutor(clients) as pool:
+        started = time.perf_counter()
+        ok = all(pool.map(lambda _: hasher.verify(PASSWORD, stored), range(logins)))
+        elapsed = time.perf_counter() - started
+    assert ok
+    return logins / elapsed, elapsed / logins * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='비밀번호 검증 처리량 측정')
+    parser.add_argument('--clients', type=int, default=16, help='동시에 로그인하는 클라이언트 수')
+    parser.add_argument('--logins', type=int, default=64, help='설정마다 검증할 로그인 수')
+    parser.add_argument('--workers', type=int, default=2, help='인증 스레드 풀 크기')
+    args = parser.parse_args()
+
+    print(f'{"scheme":<15} {"cost":>8} {"logins/s":>10} {"ms/login":>10}')
+    legacy = PasswordHasher(workers=args.workers)
+    stored = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    rate, latency = bench(legacy, stored, args.clients, args.logins * 100)
+    print(f'{"sha256 (old)":<15} {"-":>8} {rate:>10.1f} {latency:>10.3f}')
+    legacy.shutdown()
+
+    for scheme, cost in SETTINGS:
+        hasher = PasswordHasher(scheme, workers=args.workers, **cost)
+        stored = hasher.hash(PASSWORD)
+        rate, latency = bench(hasher, stored, args.clients, args.logins)
+        print(f'{scheme:<15} {next(iter(cost.values())):>8} {rate:>10.1f} {latency:>10.3f}')
+        hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
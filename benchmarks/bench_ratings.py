@@ -0,0 +1,101 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ktp.elo import DOUBLE, DRAW, SINGLE  # noqa: E402
+from ktp.ratings import RATING_SYSTEMS, get_rating_system  # noqa: E402
+
+# 가상의 시즌을 레이팅 방식별로 다시 계산해서 처리량과 예측 정확도(log-loss)를 비교한다.
+# 각 기간의 경기 결과는 그 기간이 시작할 때의 레이팅으로 예측한 뒤 반영한다
+#   python benchmarks/bench_ratings.py --players 500 --matches 200000 --periods 100
+#   python benchmarks/bench_ratings.py --database ktp.db      실제 리그 기록 (주 단위 기간)
+
+
+# 실력(로지스틱 단위)이 정해진 플레이어들의 시즌. 일부는 시즌 중간에 합류한다
+def synthetic_season(players, matches, periods, doubles=0.3, draws=0.02, seed=0):
+    rng = np.random.default_rng(seed)
+    skill = rng.normal(0, 1, players)
+    joined = np.where(rng.random(players) < 0.2, rng.integers(0, periods, players), 0)
+    period = np.sort(rng.integers(0, periods, matches))
+    winners = np.full((matches, 2), -1, dtype=np.int64)
+    losers = np.full((matches, 2), -1, dtype=np.int64)
+    match_types = np.where(rng.random(matches) < doubles, DOUBLE, SINGLE)
+    for i in range(matches):
+        pool = np.flatnonzero(joined <= period[i])
+        size = 4 if match_types[i] == DOUBLE else 2
+        picked = rng.choice(pool, size, replace=False)
+        a, b = picked[:size // 2], picked[size // 2:]
+        p = 1 / (1 + np.exp(-(skill[a].mean() - skill[b].mean())))
+        if rng.random() >= p:
+            a, b = b, a
+        winners[i, :len(a)], losers[i, :len(b)] = a, b
+    match_types[rng.random(matches) < draws] = DRAW
+    return players, period, winners, losers, match_types
+
+
+# 저장소의 경기 기록. ISO 주 하나를 한 기간으로 본다
+def league_history(path):
+    from ktp.storage import SQLiteStorage
+
+    events = SQLiteStorage(path).load_events().iloc[::-1]
+    events = events[events['Kind'].isin(['single', 'double', 'draw'])]
+    names = {}
+    winners = np.full((len(events), 2), -1, dtype=np.int64)
+    losers = np.full((len(events), 2), -1, dtype=np.int64)
+    match_types = np.empty(len(events), dtype=np.int64)
+    weeks = []
+    for i, (kind, players, played_at) in enumerate(zip(events['Kind'], events['Players'], events['Played At'])):
+        ids = [names.setdefault(p, len(names)) for p in players]
+        half = len(ids) // 2
+        winners[i, :half], losers[i, :half] = ids[:half], ids[half:]
+        match_types[i] = {'single': SINGLE, 'double': DOUBLE, 'draw': DRAW}[kind]
+        weeks.append(tuple(datetime.fromisoformat(played_at).isocalendar()[:2]))
+    _, period = np.unique(np.array(weeks).reshape(-1, 2), axis=0, return_inverse=True)
+    return len(names), period.ravel(), winners, losers, match_types
+
+
+def run(system, players, period, winners, losers, match_types):
+    state = system.new_state(players)
+    bounds = np.flatnonzero(np.diff(period)) + 1
+    elapsed, loss, counted = 0.0, 0.0, 0
+    for batch in np.split(np.arange(len(period)), bounds):
+        w, l, t = winners[batch], losers[batch], match_types[batch]
+        decided = t != DRAW
+        p = np.clip(system.predict(state, w[decided], l[decided]), 1e-12, 1)
+        loss -= np.log(p).sum()
+        counted += int(decided.sum())
+        started = time.perf_counter()
+        state = system.update(state, w, l, t)
+        elapsed += time.perf_counter() - started
+    return len(period) / elapsed, loss / max(counted, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='레이팅 방식별 처리량과 log-loss 비교')
+    parser.add_argument('--players', type=int, default=500)
+    parser.add_argument('--matches', type=int, default=200_000)
+    parser.add_argument('--periods', type=int, default=100, help='레이팅 기간 수')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database', help='가상 시즌 대신 이 DB 의 경기 기록을 쓴다')
+    parser.add_argument('--systems', nargs='+', default=list(RATING_SYSTEMS), choices=list(RATING_SYSTEMS))
+    args = parser.parse_args()
+
+    if args.database:
+        season = league_history(args.database)
+    else:
+        season = synthetic_season(args.players, args.matches, args.periods, seed=args.seed)
+    print(f'{season[0]} players, {len(season[1])} matches, {int(season[1].max(initial=-1)) + 1} periods')
+    print(f'{"system":<10} {"matches/s":>12} {"log-loss":>10}')
+    for name in args.systems:
+        rate, loss = run(get_rating_system(name), *season)
+        print(f'{name:<10} {rate:>12.0f} {loss:>10.4f}')
+
+
+if __name__ == '__main__':
+    main()
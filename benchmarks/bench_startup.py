@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 새 세션이 첫 화면을 그리기까지의 시간 (time-to-first-render)
+#   cold   새 서버 프로세스의 첫 세션. 모듈 import 와 저장소 열기가 포함된다
+#   warm   이미 떠 있는 프로세스에 새로 들어오는 세션
+#   burst  새 프로세스에 세션 sessions 개가 한꺼번에 들어올 때, 각 세션이 랭킹 화면의 데이터를 받는 시간
+# AppTest 는 한 프로세스에서 동시에 돌릴 수 없으므로 burst 는 페이지와 같은 공유 데이터 계층을 스레드로 부른다.
+# 목표를 넘으면 종료 코드 1
+#   python benchmarks/bench_startup.py --players 200 --sessions 40
+
+
+def seed(directory, players, matches):
+    sys.path.insert(0, ROOT)
+    from ktp.storage import SQLiteStorage
+
+    storage = SQLiteStorage(os.path.join(directory, 'ktp.db'))
+    names = [f'player{i}' for i in range(players)]
+    storage.append_events([('add', [name], False, '2024-01-01T00:00:00') for name in names])
+    storage.append_events([
+        ('single', [names[i % players], names[(i * 7 + 1) % players]], 0, f'2024-02-01T00:{i // 60 % 60:02d}:{i % 60:02d}')
+        for i in range(matches) if i % players != (i * 7 + 1) % players
+    ])
+
+
+def first_render():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, 'main.py'), default_timeout=60)
+    at.session_state.logged_in = True
+    at.session_state.role = 'user'
+    at.session_state.userid = 'member'
+    at.session_state.username = 'Member'
+    started = time.perf_counter()
+    at.run()
+    elapsed = (time.perf_counter() - started) * 1000
+    assert not at.exception, at.exception
+    return elapsed
+
+
+# 랭킹 화면이 첫 실행에서 읽는 것들
+def ranking_data():
+    from ktp.cache import ranking_cache
+    from ktp.leaderboard import get_leaderboard
+    from ktp.leagues import get_registry
+    from ktp.screenshots import get_screenshot_store
+
+    started = time.perf_counter()
+    league = get_registry().get(None)
+    board = get_leaderboard(league['league'])
+    version = board.refresh()
+    ranking_cache.get(('ranking', board.storage.path, 25), version, lambda: board.build_page(0, 25))
+    get_screenshot_store().latest()
+    return (time.perf_counter() - started) * 1000
+
+
+# 측정용 프로세스. streamlit 은 먼저 불러 둔다(서버가 이미 떠 있는 상태)
+def child(mode, sessions):
+    import streamlit  # noqa: F401
+
+    sys.path.insert(0, ROOT)
+    if mode == 'render':
+        result = {'cold': first_render(), 'warm': [first_render() for _ in range(sessions)]}
+    else:
+        # import 시간은 cold 에서 재므로 여기서는 모듈만 미리 불러 두고, 저장소/랭킹 초기화부터 잰다
+        import ktp.leaderboard, ktp.screenshots  # noqa: E401, F401
+        with ThreadPoolExecutor(sessions) as pool:
+            result = {'burst': list(pool.map(lambda _: ranking_data(), range(sessions)))}
+    print(json.dumps(result))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='새 세션의 첫 화면까지 걸리는 시간')
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--matches', type=int, default=5000)
+    parser.add_argument('--sessions', type=int, default=40, help='동시에 들어오는 세션 수')
+    parser.add_argument('--runs', type=int, default=3, help='새 프로세스로 반복할 횟수')
+    parser.add_argument('--cold-target', type=float, default=1500, help='첫 세션 목표 (ms)')
+    parser.add_argument('--warm-target', type=float, default=150, help='새 세션 p95 목표 (ms)')
+    parser.add_argument('--burst-target', type=float, default=500, help='동시 세션 p95 목표 (ms)')
+    parser.add_argument('--child', choices=['render', 'burst'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.sessions)
+
+    results = {'cold': [], 'warm': [], 'burst': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        seed(tmp, args.players, args.matches)
+        env = dict(os.environ, KTP_DATABASE=os.path.join(tmp, 'ktp.db'),
+                   KTP_SCREENSHOTS=os.path.join(tmp, 'screenshots'))
+        for _ in range(args.runs):
+            for mode in ('render', 'burst'):
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--child', mode, '--sessions', str(args.sessions)],
+                    env=env, cwd=tmp, capture_output=True, text=True, check=True,
+                ).stdout
+                for key, value in json.loads(output.strip().splitlines()[-1]).items():
+                    results[key] += value if isinstance(value, list) else [value]
+
+    checks = [
+        (f'cold first render (median of {args.runs})', statistics.median(results['cold']), args.cold_target),
+        ('warm first render p95', percentile(results['warm'], 0.95), args.warm_target),
+        (f'{args.sessions} sessions at once p95', percentile(results['burst'], 0.95), args.burst_target),
+    ]
+    missed = False
+    for label, value, target in checks:
+        ok = value <= target
+        missed |= not ok
+        print(f'  {"ok  " if ok else "SLOW"} {label:<36} {value:8.1f} ms   target {target:.0f} ms')
+    sys.exit(1 if missed else 0)
+
+
+if __name__ == '__main__':
+    main()
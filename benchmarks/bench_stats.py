@@ -0,0 +1,64 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ktp.storage import SQLiteStorage  # noqa: E402
+
+# 경기 기록 통계의 유지 비용과 조회 시간
+#   python benchmarks/bench_stats.py --players 200 --matches 100000
+
+
+def timed(label, func, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - started) / repeat
+    unit = f'{elapsed * 1000:.2f} ms' if elapsed < 1 else f'{elapsed:.2f} s'
+    print(f'{label:<40} {unit:>12}')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='경기 기록 통계 벤치마크')
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--matches', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    players = [f'player{i}' for i in range(args.players)]
+    start = datetime(2024, 1, 1)
+    events = []
+    for i in range(args.matches):
+        played_at = (start + timedelta(minutes=i)).isoformat(timespec='seconds')
+        if rng.random() < 0.7:
+            events.append(('single', rng.sample(players, 2), 0, played_at))
+        else:
+            events.append(('double', rng.sample(players, 4), 0, played_at))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'bench.db'))
+        storage.append_events([('add', [p], False, '2023-12-31T00:00:00') for p in players])
+        timed(f'record {args.matches} matches (one batch)', lambda: storage.append_events(events))
+        timed(f'rebuild stats from {args.matches} matches', storage.rebuild_stats)
+        timed('record one match', lambda: storage.append_event('single', rng.sample(players, 2)), repeat=50)
+        backdated = (start + timedelta(minutes=args.matches - 100)).isoformat(timespec='seconds')
+        timed('record one match 100 matches back', lambda: storage.append_event(
+            'single', rng.sample(players, 2), played_at=backdated), repeat=10)
+
+        name = players[0]
+        timed('player stats', lambda: storage.get_player_stats(name), repeat=200)
+        timed('head-to-head', lambda: storage.load_head_to_head(name), repeat=200)
+        timed('partners', lambda: storage.load_partners(name), repeat=200)
+        history = timed('rating history', lambda: storage.load_rating_history(name), repeat=20)
+        print(f'{name}: {len(history)} history rows, {storage.get_player_stats(name)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ktp.leaderboard import Leaderboard  # noqa: E402
+from ktp.passwords import PasswordHasher  # noqa: E402
+from ktp.storage import SQLiteStorage  # noqa: E402
+from ktp.users import UserStore  # noqa: E402
+
+# 가상의 리그로 랭킹/로그인 경로 전체를 재는 벤치마크. 결과는 JSON 으로 남기고 이전 결과와 비교한다
+#   python benchmarks/run.py                                   small, medium
+#   python benchmarks/run.py --profiles large --output new.json
+#   python benchmarks/run.py --baseline old.json --threshold 0.2   20% 이상 느려지면 종료 코드 1
+# 각 항목은 값과 단위, 그리고 작을수록 좋은지(lower) 클수록 좋은지(higher)를 같이 기록한다
+
+# 이름 -> (플레이어 수, 경기 수, 사용자 수)
+PROFILES = {
+    'tiny': (100, 1_000, 100),
+    'small': (100, 10_000, 100),
+    'medium': (10_000, 100_000, 1_000),
+    'large': (100_000, 1_000_000, 10_000),
+}
+DEFAULT_PROFILES = ['small', 'medium']
+PASSWORD = 'correct horse battery staple'
+# 이보다 작은 시간 차이는 측정 잡음으로 보고 회귀로 치지 않는다
+NOISE = {'ms': 0.5, 's': 0.005}
+
+
+# 경기 순서대로의 가상 시즌. 70% 단식, 2% 무승부
+def synthetic_matches(players, matches, seed=0):
+    rng = random.Random(seed)
+    names = [f'player{i}' for i in range(players)]
+    start = datetime(2024, 1, 1)
+    events = []
+    for i in range(matches):
+        played_at = (start + timedelta(seconds=30 * i)).isoformat(timespec='seconds')
+        kind = 'single' if rng.random() < 0.7 else 'double'
+        picked = rng.sample(names, 2 if kind == 'single' else 4)
+        if rng.random() < 0.02:
+            kind = 'draw'
+        events.append((kind, picked, 0, played_at))
+    return names, events
+
+
+# 가상의 사용자 표. 해싱 비용 때문에 모든 사용자가 같은 해시를 쓴다
+def synthetic_users(users, stored):
+    return pd.DataFrame([{
+        'UserID': f'user{i}', 'Password': stored, 'Username': f'User {i}',
+        'Role': 'admin' if i == 0 else 'user', 'Approved': True,
+    } for i in range(users)])
+
+
+class Results:
+    def __init__(self):
+        self.values = {}
+
+    def add(self, name, value, unit, better='lower'):
+        self.values[name] = {'value': round(value, 6), 'unit': unit, 'better': better}
+        print(f'  {name:<32} {value:>14.3f} {unit}')
+
+
+# 지워지지 않은 이벤트 수. 전체 기록을 읽지 않고 DB 에서 센다
+def event_count(storage):
+    return storage.connect().execute('SELECT COUNT(*) FROM events WHERE deleted = 0').fetchone()[0]
+
+
+# 한 번 실행한 시간(초)
+def once(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+# repeat 번 실행한 시간의 중앙값과 p95 (밀리초)
+def latencies(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def run_profile(name, players, matches, users, args):
+    print(f'{name}: {players} players, {matches} matches, {users} users')
+    results = Results()
+    rng = random.Random(args.seed)
+    names, events = synthetic_matches(players, matches, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        storage = SQLiteStorage(path)
+        elapsed, _ = once(lambda: storage.append_events([('add', [p], False, '2023-12-31T00:00:00') for p in names]))
+        results.add('seed_players_s', elapsed, 's')
+        elapsed, _ = once(lambda: storage.append_events(events))
+        results.add('record_batch_matches_per_s', matches / elapsed, 'matches/s', 'higher')
+
+        # 새 프로세스가 처음 랭킹을 읽는 시간
+        elapsed, _ = once(lambda: SQLiteStorage(path).load_players())
+        results.add('load_players_s', elapsed, 's')
+        board = Leaderboard(SQLiteStorage(path))
+        elapsed, _ = once(board.refresh)
+        results.add('load_leaderboard_s', elapsed, 's')
+
+        median, p95 = latencies(lambda: board.record('single', rng.sample(names, 2)), args.repeat)
+        results.add('record_single_ms', median, 'ms')
+        results.add('record_single_p95_ms', p95, 'ms')
+        median, _ = latencies(lambda: board.record('double', rng.sample(names, 4)), args.repeat)
+        results.add('record_double_ms', median, 'ms')
+        backdated = events[-100][3]
+        median, _ = latencies(lambda: board.record('single', rng.sample(names, 2), played_at=backdated),
+                              max(1, args.repeat // 10))
+        results.add('record_backdated_ms', median, 'ms')
+
+        median, _ = latencies(board.build_table, max(1, args.repeat // 10))
+        results.add('render_table_ms', median, 'ms')
+        results.add('render_table_bytes', len(board.build_table()[1]), 'bytes')
+        median, _ = latencies(board.rows, max(1, args.repeat // 10))
+        results.add('rankings_rows_ms', median, 'ms')
+        # 화면에 보이는 한 페이지. 리그가 커져도 시간과 크기가 같아야 한다
+        middle = board.count() // 2
+        median, _ = latencies(lambda: board.build_page(middle, 25), args.repeat)
+        results.add('render_page_ms', median, 'ms')
+        results.add('render_page_bytes', len(board.build_page(middle, 25)[1]), 'bytes')
+        median, _ = latencies(lambda: board.search(f'player{rng.randrange(players)}'), args.repeat)
+        results.add('search_ms', median, 'ms')
+
+        hasher = PasswordHasher(workers=args.workers)
+        storage.upsert_users(synthetic_users(users, hasher.hash(PASSWORD)))
+        store = UserStore(SQLiteStorage(path))
+        elapsed, _ = once(store.refresh)
+        results.add('load_users_s', elapsed, 's')
+
+        # 로그인 = 사용자 조회 + 비밀번호 검증. clients 개가 동시에 로그인한다
+        def login(i):
+            user = store.get(f'user{i % users}')
+            return user is not None and hasher.verify(PASSWORD, user['Password'])
+
+        with ThreadPoolExecutor(args.clients) as pool:
+            elapsed, ok = once(lambda: all(pool.map(login, range(args.logins))))
+        assert ok
+        results.add('login_per_s', args.logins / elapsed, 'logins/s', 'higher')
+        median, _ = latencies(lambda: store.get(f'user{rng.randrange(users)}'), args.repeat)
+        results.add('user_lookup_ms', median, 'ms')
+        hasher.shutdown()
+
+        # 여러 세션이 동시에 경기 결과를 보낸다
+        before = event_count(storage)
+        per_client = max(1, args.repeat // args.clients)
+
+        def submit(worker):
+            local = random.Random(worker)
+            for _ in range(per_client):
+                board.record('single', local.sample(names, 2))
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(args.clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        submitted = args.clients * per_client
+        assert event_count(storage) - before == submitted, 'lost submissions'
+        results.add('concurrent_submissions_per_s', submitted / elapsed, 'matches/s', 'higher')
+    return results.values
+
+
+# 이전 결과보다 threshold 이상 나빠진 항목
+def regressions(current, baseline, threshold):
+    found = []
+    for profile, values in current.items():
+        for name, entry in values.items():
+            old = baseline.get(profile, {}).get(name)
+            if old is None or not old['value'] or not entry['value']:
+                continue
+            if entry['better'] == 'lower':
+                change = entry['value'] / old['value'] - 1
+            else:
+                change = old['value'] / entry['value'] - 1
+            if abs(entry['value'] - old['value']) < NOISE.get(entry['unit'], 0):
+                continue
+            if change > threshold:
+                found.append((profile, name, old['value'], entry['value'], change))
+    return found
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='랭킹/로그인 경로 벤치마크')
+    parser.add_argument('--profiles', nargs='+', default=DEFAULT_PROFILES, choices=list(PROFILES))
+    parser.add_argument('--repeat', type=int, default=200, help='지연 시간을 잴 때 반복 횟수')
+    parser.add_argument('--clients', type=int, default=8, help='동시 로그인/제출 수')
+    parser.add_argument('--logins', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=2, help='인증 스레드 풀 크기')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='결과 JSON 파일 (기본값: 출력하지 않음)')
+    parser.add_argument('--baseline', help='비교할 이전 결과 JSON 파일')
+    parser.add_argument('--threshold', type=float, default=0.2, help='이만큼 나빠지면 실패 (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+        'results': {},
+    }
+    for name in args.profiles:
+        report['results'][name] = run_profile(name, *PROFILES[name], args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wrote {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        found = regressions(report['results'], baseline, args.threshold)
+        for profile, name, old, new, change in found:
+            print(f'REGRESSION {profile}/{name}: {old:.3f} -> {new:.3f} ({change:+.0%})')
+        if found:
+            sys.exit(1)
+        print(f'No regressions over {args.threshold:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
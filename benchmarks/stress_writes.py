@@ -0,0 +1,108 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ktp.storage import SQLiteStorage  # noqa: E402
+
+# 여러 스레드/프로세스가 동시에 경기 결과와 사용자 수정을 보내고, 잃어버린 쓰기가 없는지 확인한다
+#   python benchmarks/stress_writes.py --threads 8 --processes 4 --submissions 50
+
+PLAYERS = [f'player{i}' for i in range(12)]
+USERID = 'stress'
+
+
+def submit(storage, worker, submissions):
+    rng = random.Random(worker)
+    singles = doubles = 0
+    for _ in range(submissions):
+        if rng.random() < 0.7:
+            storage.append_event('single', rng.sample(PLAYERS, 2))
+            singles += 1
+        else:
+            storage.append_event('double', rng.sample(PLAYERS, 4))
+            doubles += 1
+        # 같은 사용자를 여러 관리자가 동시에 고치는 상황
+        storage.update_user(USERID, lambda u: dict(u, Username=u['Username'] + '.'))
+    return singles, doubles
+
+
+def process_worker(path, worker, submissions, results):
+    results.put(submit(SQLiteStorage(path), worker, submissions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='동시 쓰기 스트레스 테스트')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--submissions', type=int, default=50, help='워커 하나가 보내는 경기 수')
+    parser.add_argument('--db', help='기본값은 임시 디렉터리의 새 DB')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'stress.db')
+    storage = SQLiteStorage(path)
+    storage.append_events([('add', [name], False, None) for name in PLAYERS])
+    storage.upsert_users(pd.DataFrame([{
+        'UserID': USERID, 'Password': '-', 'Username': 'u', 'Role': 'user', 'Approved': False,
+    }]))
+    before = len(storage.load_events())
+
+    started = time.perf_counter()
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=process_worker, args=(path, 1000 + i, args.submissions, results))
+        for i in range(args.processes)
+    ]
+    thread_results = []
+    threads = [
+        threading.Thread(target=lambda i=i: thread_results.append(submit(storage, i, args.submissions)))
+        for i in range(args.threads)
+    ]
+    exports = [
+        threading.Thread(target=storage.export_excel, args=(os.path.join(os.path.dirname(path), 'export.xlsx'), None))
+        for _ in range(3)
+    ]
+    for worker in processes + threads + exports:
+        worker.start()
+    counts = [results.get() for _ in processes]
+    for worker in processes + threads + exports:
+        worker.join()
+    counts += thread_results
+    elapsed = time.perf_counter() - started
+
+    singles = sum(c[0] for c in counts)
+    doubles = sum(c[1] for c in counts)
+    total = singles + doubles
+    players = storage.load_players()
+    materialized = players.set_index('Player').sort_index()
+    storage.rebuild()
+    replayed = storage.load_players().set_index('Player').sort_index()
+    username = storage.load_users().set_index('UserID').at[USERID, 'Username']
+
+    checks = {
+        'events': (len(storage.load_events()) - before, total),
+        'wins': (int(players['Wins'].sum()), singles + 2 * doubles),
+        'losses': (int(players['Losses'].sum()), singles + 2 * doubles),
+        'user updates': (len(username) - 1, total),
+        'replay matches': (materialized.equals(replayed), True),
+        'export readable': (len(pd.read_excel(os.path.join(os.path.dirname(path), 'export.xlsx'))), len(PLAYERS)),
+    }
+    print(f'{total} submissions from {len(counts)} workers in {elapsed:.2f}s ({total / elapsed:.0f}/s)')
+    failed = False
+    for name, (actual, expected) in checks.items():
+        ok = actual == expected
+        failed |= not ok
+        print(f'  {"ok  " if ok else "FAIL"} {name}: {actual} (expected {expected})')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,29 @@
+import sys
 import pandas as pd
-import hashlib
+from ktp.passwords import hash_password
+from ktp.storage import get_storage
 
-# 초기 사용자 데이터프레임 생성
-def initialize_users():
-    df = pd.DataFrame(columns=['UserID', 'Password', 'Username', 'Role', 'Approved'])
-    return df
-
-# 비밀번호 해싱 함수
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-# 초기 엑셀 파일 생성
-def initialize_excel(filename='users.xlsx'):
-    df = initialize_users()
-    # 초기 admin 유저 추가
-    admin_user = pd.DataFrame([{
+# 초기 admin 유저를 저장소에 추가. 이미 있으면 reset=True 일 때만 비밀번호를 초기값으로 되돌린다
+def initialize_admin(reset=False):
+    admin_user = {
         'UserID': 'admin',
         'Password': hash_password('admin_password'),  # 초기 admin 비밀번호를 설정합니다.
         'Username': 'Admin User',
         'Role': 'admin',
         'Approved': True
-    }])
-    df = pd.concat([df, admin_user], ignore_index=True)
-    df.to_excel(filename, index=False)
+    }
+    storage = get_storage()
+    if storage.add_user(admin_user):
+        return True
+    if reset:
+        storage.upsert_users(pd.DataFrame([admin_user]))
+        return True
+    return False
 
-# 엑셀 파일 초기화 실행
-initialize_excel()
+# 저장소 초기화 실행. 불러오기만 해서는 아무것도 바꾸지 않는다
+#   python initialize_admin.py [--reset]
+if __name__ == '__main__':
+    if initialize_admin(reset='--reset' in sys.argv[1:]):
+        print('admin user initialized')
+    else:
+        print('admin user already exists (use --reset to restore the initial password)')
@@ -0,0 +1,152 @@
+import argparse
+import json
+import sys
+
+import pandas as pd
+
+from ktp import api
+from ktp.events import joined_timestamp, match_timestamp
+from ktp.leaderboard import TABLE_COLUMNS, get_leaderboard
+
+# python -m ktp [--league 이름] <명령>
+#   rankings [--no-guests] [--json] [--offset 0 --limit 50] [--search 이름]
+#   record --winner A [--winner B] --loser C [--loser D] [--draw] [--date 2024-05-01]
+#   championship NAME
+#   add-player NAME [--guest] [--date 2024-05-01]
+#   import [--players league_of_ktp.xlsx] [--users users.xlsx]
+#   import-matches results.csv [--add-missing]
+#   export [--players league_of_ktp.xlsx] [--users users.xlsx]
+#   stats NAME [--json]
+#   rebuild-stats
+#   leagues
+#   create-league NAME [--title TITLE]
+#   rollover
+#   standings SEASON
+#   serve [--host 127.0.0.1] [--port 8502]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m ktp', description='League of KTP')
+    parser.add_argument('--league', help='리그 이름 (기본값: KTP_LEAGUE)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    rankings = commands.add_parser('rankings', help='현재 순위 출력')
+    rankings.add_argument('--no-guests', action='store_true')
+    rankings.add_argument('--json', action='store_true')
+    rankings.add_argument('--offset', type=int, default=0, help='이 순위 다음부터 (0 부터)')
+    rankings.add_argument('--limit', type=int, help='보여줄 행 수 (기본값: 전체)')
+    rankings.add_argument('--search', help='이름이 이걸로 시작하는 플레이어만')
+
+    record = commands.add_parser('record', help='경기 결과 기록')
+    record.add_argument('--winner', action='append', required=True)
+    record.add_argument('--loser', action='append', required=True)
+    record.add_argument('--draw', action='store_true')
+    record.add_argument('--date', type=pd.Timestamp, help='경기 날짜 (기본값: 오늘)')
+
+    championship = commands.add_parser('championship', help='우승 기록')
+    championship.add_argument('player')
+
+    add_player = commands.add_parser('add-player', help='플레이어 추가')
+    add_player.add_argument('name')
+    add_player.add_argument('--guest', action='store_true')
+    add_player.add_argument('--date', type=pd.Timestamp, help='가입 날짜 (기본값: 지금). 이 날짜부터의 경기에 넣을 수 있다')
+
+    for name, help_text in (('import', '엑셀 파일에서 가져오기'), ('export', '엑셀 파일로 내보내기')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--players', default='league_of_ktp.xlsx')
+        command.add_argument('--users', default='users.xlsx')
+
+    import_matches = commands.add_parser('import-matches', help='경기 결과 파일(csv/xlsx) 일괄 기록')
+    import_matches.add_argument('filename')
+    import_matches.add_argument('--add-missing', action='store_true')
+
+    stats = commands.add_parser('stats', help='플레이어 경기 기록 통계')
+    stats.add_argument('player')
+    stats.add_argument('--json', action='store_true')
+
+    commands.add_parser('rebuild-stats', help='경기 기록 통계를 처음부터 다시 계산')
+
+    commands.add_parser('leagues', help='리그 목록')
+    create_league = commands.add_parser('create-league', help='리그 추가')
+    create_league.add_argument('name')
+    create_league.add_argument('--title')
+    commands.add_parser('rollover', help='현재 시즌을 끝내고 새 시즌 시작')
+    standings = commands.add_parser('standings', help='끝난 시즌의 최종 순위')
+    standings.add_argument('season', type=int)
+
+    serve = commands.add_parser('serve', help='JSON 순위 API 서버 실행')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8502)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    board = get_leaderboard(args.league)
+
+    if args.command == 'rankings':
+        if args.limit is not None or args.search or args.offset:
+            rows = api.rankings_page(args.offset, args.limit or 50, not args.no_guests, args.search, board)['rows']
+        else:
+            rows = api.rankings(include_guests=not args.no_guests, board=board)
+        if args.json:
+            print(json.dumps(rows, ensure_ascii=False, indent=2))
+        else:
+            print(pd.DataFrame(rows, columns=TABLE_COLUMNS).to_string(index=False))
+    elif args.command == 'record':
+        played_at = match_timestamp(args.date.date()) if args.date is not None else None
+        seq = api.record_match(args.winner, args.loser, args.draw, played_at, board)
+        print(f'Recorded match #{seq}.')
+    elif args.command == 'championship':
+        seq = api.record_championship(args.player, board=board)
+        print(f'Recorded championship #{seq}.')
+    elif args.command == 'add-player':
+        played_at = joined_timestamp(args.date.date()) if args.date is not None else None
+        api.add_player(args.name, args.guest, played_at, board)
+        print(f'Added {args.name}.')
+    elif args.command == 'import':
+        api.import_excel(args.players, args.users, board)
+    elif args.command == 'import-matches':
+        count = api.import_matches(args.filename, args.add_missing, board)
+        print(f'{count} events imported.')
+    elif args.command == 'export':
+        api.export_excel(args.players, args.users, board)
+    elif args.command == 'stats':
+        stats = api.player_stats(args.player, board)
+        if stats is None:
+            raise ValueError(f'Unknown player: {args.player}')
+        if args.json:
+            print(json.dumps(stats, ensure_ascii=False, indent=2))
+        else:
+            for key in ('Matches', 'Wins', 'Losses', 'Draws', 'Streak', 'Best Streak', 'Form', 'Last Played'):
+                print(f'{key:<12} {stats[key]}')
+            for key in ('Head to Head', 'Partners'):
+                if stats[key]:
+                    print(f'\n{key}')
+                    print(pd.DataFrame(stats[key]).to_string(index=False))
+    elif args.command == 'rebuild-stats':
+        api.rebuild_stats(board)
+        print('Statistics rebuilt.')
+    elif args.command == 'leagues':
+        print(pd.DataFrame(api.leagues(), columns=['league', 'title', 'season']).to_string(index=False))
+    elif args.command == 'create-league':
+        api.create_league(args.name, args.title)
+        print(f'Created league {args.name}.')
+    elif args.command == 'rollover':
+        season = api.rollover_season(args.league)
+        print(f'Started season {season}.')
+    elif args.command == 'standings':
+        rows = api.season_standings(args.season, args.league)
+        if rows is None:
+            raise ValueError(f'Season {args.season} has not ended.')
+        print(pd.DataFrame(rows).to_string(index=False))
+    elif args.command == 'serve':
+        from ktp.server import serve
+        serve(args.host, args.port)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except ValueError as e:
+        sys.exit(f'error: {e}')
@@ -0,0 +1,138 @@
+from collections.abc import Sequence
+
+from ktp.bulk_import import import_results
+from ktp.elo import CHAMPIONSHIP_POINTS
+from ktp.leagues import get_registry
+from ktp.leaderboard import Leaderboard, get_leaderboard
+from ktp.stats import new_stats
+from ktp.storage import get_storage
+
+# 스트림릿 없이 쓸 수 있는 리그 기능. 페이지, CLI, HTTP 서버가 모두 이 함수들을 쓴다
+
+
+def _board(board: Leaderboard | None) -> Leaderboard:
+    return board or get_leaderboard()
+
+
+# 경기 결과 기록. 단식은 선수 1명씩, 복식은 2명씩. 새 이벤트의 seq 를 돌려준다
+def record_match(winners: Sequence[str], losers: Sequence[str], draw: bool = False,
+                 played_at: str | None = None, board: Leaderboard | None = None) -> int:
+    if len(winners) != len(losers) or len(winners) not in (1, 2):
+        raise ValueError('A match needs one or two players on each side.')
+    kind = 'draw' if draw else ('single' if len(winners) == 1 else 'double')
+    return _board(board).record(kind, [*winners, *losers], played_at=played_at)
+
+
+def record_championship(player: str, points: int = CHAMPIONSHIP_POINTS,
+                        played_at: str | None = None, board: Leaderboard | None = None) -> int:
+    return _board(board).record('championship', [player], points, played_at)
+
+
+# played_at 은 가입 날짜. 그 이전 날짜의 경기에는 넣을 수 없다
+def add_player(name: str, guest: bool = False, played_at: str | None = None,
+               board: Leaderboard | None = None) -> int:
+    return _board(board).record('add', [name], guest, played_at)
+
+
+def remove_player(name: str, board: Leaderboard | None = None) -> int:
+    return _board(board).record('remove', [name])
+
+
+def delete_match(seq: int, board: Leaderboard | None = None) -> None:
+    _board(board).delete_event(seq)
+
+
+# 현재 순위. 각 행은 Rank, Player, Ranking Points, Wins, Losses, Draws, Championships, Guest
+def rankings(include_guests: bool = True, board: Leaderboard | None = None) -> list[dict]:
+    board = _board(board)
+    board.refresh()
+    return board.rows(include_guests)
+
+
+# 순위 한 페이지. offset 번째(0부터)부터 limit 명, query 가 있으면 이름이 그걸로 시작하는 플레이어만
+def rankings_page(offset: int = 0, limit: int = 50, include_guests: bool = True, query: str | None = None,
+                  board: Leaderboard | None = None) -> dict:
+    board = _board(board)
+    board.refresh()
+    if query:
+        total, rows = board.search(query, offset, limit, include_guests)
+        return {'total': total, 'offset': offset, 'rows': rows}
+    return {'total': board.count(include_guests), 'offset': offset, 'rows': board.window(offset, limit, include_guests)}
+
+
+def player(name: str, board: Leaderboard | None = None) -> dict | None:
+    board = _board(board)
+    board.refresh()
+    return board.row(name)
+
+
+# 플레이어 한 명의 경기 기록 통계: 누적 기록, 상대별 전적, 복식 파트너별 전적
+def player_stats(name: str, board: Leaderboard | None = None) -> dict | None:
+    storage = _board(board).storage
+    stats = storage.get_player_stats(name)
+    if stats is None:
+        # 이번 시즌에 아직 경기가 없는 플레이어
+        if storage.get_player(name) is None:
+            return None
+        stats = new_stats()
+    return {
+        'Player': name,
+        **stats,
+        'Head to Head': storage.load_head_to_head(name).to_dict('records'),
+        'Partners': storage.load_partners(name).to_dict('records'),
+    }
+
+
+# 경기마다의 결과와 직후 랭킹 포인트
+def rating_history(name: str, board: Leaderboard | None = None) -> list[dict]:
+    return _board(board).storage.load_rating_history(name).to_dict('records')
+
+
+def rebuild_stats(board: Leaderboard | None = None) -> None:
+    board = _board(board)
+    board.storage.rebuild_stats()
+    board.refresh()
+
+
+# 리그 목록. 각 항목은 league, title, season(현재 시즌)
+def leagues() -> list[dict]:
+    return list(get_registry().refresh().values())
+
+
+def create_league(league: str, title: str | None = None) -> None:
+    get_registry().create_league(league, title)
+
+
+# 현재 시즌의 최종 순위를 보관하고 새 시즌을 시작한다. 새 시즌 번호를 돌려준다
+def rollover_season(league: str | None = None) -> int:
+    board = get_leaderboard(league)
+    board.refresh()
+    return get_registry().rollover(league, board.rows())
+
+
+# 끝난 시즌의 최종 순위. 끝나지 않은 시즌이면 None
+def season_standings(season: int, league: str | None = None) -> list[dict] | None:
+    return get_registry().standings(league, season)
+
+
+# 경기 결과 파일(csv/xlsx) 일괄 기록. 기록된 이벤트 수를 돌려준다
+def import_matches(filename: str, add_missing: bool = False, board: Leaderboard | None = None) -> int:
+    board = _board(board)
+    seqs = import_results(filename, board.storage, add_missing)
+    board.refresh()
+    return len(seqs)
+
+
+# 플레이어는 리그의 현재 시즌에, 사용자는 기본 저장소에 가져온다
+def import_excel(players_file: str | None = 'league_of_ktp.xlsx', users_file: str | None = 'users.xlsx',
+                 board: Leaderboard | None = None) -> None:
+    board = _board(board)
+    board.storage.import_excel(players_file, None)
+    get_storage().import_excel(None, users_file)
+    board.refresh()
+
+
+def export_excel(players_file: str | None = 'league_of_ktp.xlsx', users_file: str | None = 'users.xlsx',
+                 board: Leaderboard | None = None) -> None:
+    _board(board).storage.export_excel(players_file, None)
+    get_storage().export_excel(None, users_file)
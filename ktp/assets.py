@@ -0,0 +1,51 @@
+import base64
+import io
+import os
+import threading
+
+from ktp.metrics import span
+
+# 랭킹 표에 표시되는 크기
+CROWN_SIZE = 16
+CROWN_FILES = ['gold_crown.png', 'silver_crown.png', 'bronze_crown.png']
+
+ASSET_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_icons = {}
+_icons_lock = threading.Lock()
+
+
+# 표시 크기로 줄인 PNG 바이트. Pillow 가 없으면 원본을 그대로 쓴다
+def _downsized_png(path, size):
+    try:
+        from PIL import Image
+    except ImportError:
+        with open(path, 'rb') as f:
+            return f.read()
+    with Image.open(path) as image:
+        image = image.convert('RGBA')
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+
+
+# <img> 태그를 프로세스에서 한 번만 만들고 모든 세션이 같이 쓴다
+def image_tag(filename, size=CROWN_SIZE):
+    key = (filename, size)
+    tag = _icons.get(key)
+    if tag is None:
+        with _icons_lock:
+            tag = _icons.get(key)
+            if tag is None:
+                with span('assets.image_tag'):
+                    data = _downsized_png(os.path.join(ASSET_DIR, filename), size)
+                encoded = base64.b64encode(data).decode()
+                tag = f'<img src="data:image/png;base64,{encoded}" width="{size}" height="{size}"/>'
+                _icons[key] = tag
+    return tag
+
+
+# 1, 2, 3등 왕관 아이콘
+def crown_icons():
+    return [image_tag(filename) for filename in CROWN_FILES]
@@ -0,0 +1,88 @@
+import argparse
+import os
+
+import pandas as pd
+
+from ktp.storage import get_storage
+
+# 경기 결과 파일(csv/xlsx)을 한 번에 가져온다.
+#   Winner, Loser            필수. 단식 승자/패자 (무승부면 양쪽 선수)
+#   Winner 2, Loser 2        복식 파트너
+#   Result                   'draw' 이면 무승부
+#   Date                     경기 날짜. 없으면 지금 시각
+# 파일의 행 순서가 경기 순서가 된다.
+
+
+def read_results(filename, sheet_name=0):
+    if os.path.splitext(filename)[1].lower() in ('.xlsx', '.xls'):
+        return pd.read_excel(filename, sheet_name=sheet_name)
+    return pd.read_csv(filename)
+
+
+# 셀의 플레이어 이름. 빈 칸이면 None
+def _name(value):
+    if pd.isna(value):
+        return None
+    return str(value).strip() or None
+
+
+# 결과 표를 (kind, players, value, played_at) 이벤트 목록으로 변환
+def results_to_events(df):
+    df = df.rename(columns=str.strip)
+    missing = {'Winner', 'Loser'} - set(df.columns)
+    if missing:
+        raise ValueError(f'Missing columns: {", ".join(sorted(missing))}')
+    for column in ('Winner 2', 'Loser 2', 'Result', 'Date'):
+        if column not in df.columns:
+            df[column] = None
+
+    events = []
+    # 오류 메시지의 행 번호는 파일의 줄 번호 (머리글이 1번 줄)
+    for line, row in enumerate(df.to_dict('records'), start=2):
+        winner, loser = _name(row['Winner']), _name(row['Loser'])
+        if winner is None or loser is None:
+            raise ValueError(f'Row {line}: Winner and Loser should not be blank.')
+        partners = [p for p in (_name(row['Winner 2']), _name(row['Loser 2'])) if p is not None]
+        played_at = pd.Timestamp(row['Date']).isoformat(timespec='seconds') if pd.notna(row['Date']) else None
+        is_draw = pd.notna(row['Result']) and str(row['Result']).strip().lower() == 'draw'
+        if partners:
+            if len(partners) != 2:
+                raise ValueError(f'Row {line}: Double match needs both partners: {winner} vs {loser}')
+            players = [winner, partners[0], loser, partners[1]]
+            kind = 'draw' if is_draw else 'double'
+        else:
+            players = [winner, loser]
+            kind = 'draw' if is_draw else 'single'
+        events.append((kind, players, 0, played_at))
+    return events
+
+
+def import_results(filename, storage=None, add_missing=False, sheet_name=0):
+    storage = storage or get_storage()
+    events = results_to_events(read_results(filename, sheet_name))
+    known = set(storage.load_players()['Player'])
+    unknown = sorted({p for _, players, _, _ in events for p in players} - known)
+    if unknown:
+        if not add_missing:
+            raise ValueError(f'Unknown player: {", ".join(unknown)}')
+        # 새 플레이어는 가져오는 첫 경기 시점에 추가된 것으로 기록
+        dates = [played_at for _, _, _, played_at in events if played_at]
+        first = min(dates) if dates else None
+        events = [('add', [p], False, first) for p in unknown] + events
+    return storage.append_events(events)
+
+
+# 숫자면 시트 순서(0부터), 아니면 시트 이름
+def sheet_arg(value):
+    return int(value) if value.isdigit() else value
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='경기 결과 파일(csv/xlsx) 일괄 가져오기')
+    parser.add_argument('filename')
+    parser.add_argument('--sheet', type=sheet_arg, default=0, help='시트 순서(0부터) 또는 이름')
+    parser.add_argument('--add-missing', action='store_true', help='없는 플레이어는 새로 추가')
+    args = parser.parse_args()
+
+    seqs = import_results(args.filename, add_missing=args.add_missing, sheet_name=args.sheet)
+    print(f'{len(seqs)} events imported.')
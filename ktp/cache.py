@@ -0,0 +1,56 @@
+import threading
+
+from ktp.metrics import count
+
+
+# 프로세스 전체에서 공유하는 캐시. 저장소의 데이터 버전이 바뀌면 다시 만든다
+class VersionedCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._building = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                count('cache.hit')
+                return entry[1]
+            building = self._building.setdefault(key, threading.Lock())
+        # 같은 키는 한 세션만 만들고, 동시에 들어온 세션들은 기다렸다가 그 결과를 쓴다
+        with building:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version:
+                    self.hits += 1
+                    count('cache.hit')
+                    return entry[1]
+                self.misses += 1
+            count('cache.miss')
+            value = build()
+            with self._lock:
+                self._entries[key] = (version, value)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries),
+            }
+
+
+ranking_cache = VersionedCache()
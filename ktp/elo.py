@@ -0,0 +1,140 @@
+import numpy as np
+
+from ktp.metrics import timed
+
+K_FACTOR = 32
+INITIAL_POINTS = 1000
+CHAMPIONSHIP_POINTS = 50
+
+
+def calculate_elo(winner_rp, loser_rp):
+    k = K_FACTOR
+    expected_winner = 1 / (1 + 10 ** ((loser_rp - winner_rp) / 400))
+    expected_loser = 1 / (1 + 10 ** ((winner_rp - loser_rp) / 400))
+
+    winner_new_rp = int(winner_rp + k * (1 - expected_winner))
+    loser_new_rp = int(loser_rp + k * (0 - expected_loser))
+
+    return winner_new_rp, loser_new_rp
+
+
+def calculate_double_elo(winner_rps, loser_rps):
+    k = K_FACTOR
+    avg_winner_rp = sum(winner_rps) / 2
+    avg_loser_rp = sum(loser_rps) / 2
+
+    expected_winner = 1 / (1 + 10 ** ((avg_loser_rp - avg_winner_rp) / 400))
+    expected_loser = 1 / (1 + 10 ** ((avg_winner_rp - avg_loser_rp) / 400))
+
+    winner_new_rps = [int(rp + k * (1 - expected_winner)) for rp in winner_rps]
+    loser_new_rps = [int(rp + k * (0 - expected_loser)) for rp in loser_rps]
+
+    return winner_new_rps, loser_new_rps
+
+
+# 배치 계산용 경기 종류
+SINGLE = 0
+DOUBLE = 1
+DRAW = 2
+
+# 기대 승률 표. 점수 차(두 배 값, 복식 평균은 0.5 단위)를 인덱스로 쓴다.
+# 순차 계산과 같은 파이썬 float 연산으로 채워서 결과가 1비트도 달라지지 않게 한다.
+# 다른 스레드가 표를 키울 수 있으므로 전역 값은 한 번만 읽고 크기와 조회 모두 그 표로 한다
+_expected_table = np.empty((2, 0))
+
+
+def _expected(half_diffs):
+    global _expected_table
+    table = _expected_table
+    size = table.shape[1] // 2
+    needed = int(np.abs(half_diffs).max(initial=0))
+    if needed > size or table.shape[1] == 0:
+        size = max(needed, 2 * size, 4000)
+        table = np.empty((2, 2 * size + 1))
+        for i, half_diff in enumerate(range(-size, size + 1)):
+            diff = half_diff / 2
+            table[0, i] = 1 / (1 + 10 ** (diff / 400))
+            table[1, i] = 1 / (1 + 10 ** (-diff / 400))
+        _expected_table = table
+    return table[:, half_diffs + size]
+
+
+# 한 선수가 두 번 나오지 않도록 경기들을 순서대로 묶는다.
+# 각 경기는 자기 선수들이 마지막으로 나온 묶음 바로 다음 묶음에 들어간다
+def schedule_waves(winners, losers):
+    last = {}
+    waves = np.empty(len(winners), dtype=np.int64)
+    for i, players in enumerate(np.concatenate([winners, losers], axis=1).tolist()):
+        wave = 1 + max(last.get(p, -1) for p in players if p >= 0)
+        for p in players:
+            if p >= 0:
+                last[p] = wave
+        waves[i] = wave
+    return waves
+
+
+# 여러 경기를 한 번에 계산한다.
+#   ratings:     플레이어 번호별 랭킹 포인트
+#   winners:     (n, 2) 승자 번호. 단식은 두 번째 칸이 -1
+#   losers:      (n, 2) 패자 번호
+#   match_types: SINGLE / DOUBLE / DRAW
+# calculate_elo / calculate_double_elo 를 순서대로 적용한 것과 같은 결과를 돌려준다.
+# history=True 면 경기마다 직후 점수 (n, 4) [승자1, 승자2, 패자1, 패자2] 도 돌려준다 (무승부와 빈 자리는 -1)
+@timed('ratings.batch_elo')
+def batch_elo(ratings, winners, losers, match_types, history=False):
+    ratings = np.array(ratings, dtype=np.int64)
+    winners = np.asarray(winners, dtype=np.int64).reshape(len(match_types), -1)
+    losers = np.asarray(losers, dtype=np.int64).reshape(len(match_types), -1)
+    if winners.shape[1] == 1:
+        winners = np.column_stack([winners, np.full(len(winners), -1)])
+        losers = np.column_stack([losers, np.full(len(losers), -1)])
+    match_types = np.asarray(match_types, dtype=np.int64)
+
+    wins = np.zeros(len(ratings), dtype=np.int64)
+    losses = np.zeros(len(ratings), dtype=np.int64)
+    draws = np.zeros(len(ratings), dtype=np.int64)
+    decided = match_types != DRAW
+    for players, counter in ((winners[decided], wins), (losers[decided], losses),
+                             (winners[~decided], draws), (losers[~decided], draws)):
+        players = players[players >= 0]
+        np.add.at(counter, players, 1)
+
+    rated = np.flatnonzero(decided)
+    after = np.full((len(match_types), 4), -1, dtype=np.int64)
+    if len(rated) == 0:
+        return (ratings, wins, losses, draws, after) if history else (ratings, wins, losses, draws)
+
+    # 단식의 빈 자리(-1)는 마지막 임시 칸을 가리키게 해서 마스킹 없이 한 번에 계산한다
+    scratch = len(ratings)
+    ratings = np.append(ratings, 0)
+    winners, losers = winners[rated], losers[rated]
+    doubles = match_types[rated] == DOUBLE
+    waves = schedule_waves(winners, losers)
+    winners = np.where(winners < 0, scratch, winners)
+    losers = np.where(losers < 0, scratch, losers)
+    order = np.argsort(waves, kind='stable')
+    bounds = np.flatnonzero(np.diff(waves[order])) + 1
+    k = K_FACTOR
+    for batch in np.split(order, bounds):
+        w, l, dbl = winners[batch], losers[batch], doubles[batch]
+        w_rp, l_rp = ratings[w], ratings[l]
+        # 점수 차의 두 배: 단식은 2 * (패자 - 승자), 복식은 (패자 합 - 승자 합)
+        half_diffs = np.where(
+            dbl,
+            (l_rp[:, 0] + l_rp[:, 1]) - (w_rp[:, 0] + w_rp[:, 1]),
+            2 * (l_rp[:, 0] - w_rp[:, 0]),
+        )
+        expected_winner, expected_loser = _expected(half_diffs)
+        gain = k * (1 - expected_winner)
+        loss = k * (0 - expected_loser)
+        idx = np.concatenate([w[:, 0], w[:, 1], l[:, 0], l[:, 1]])
+        delta = np.concatenate([gain, gain, loss, loss])
+        ratings[idx] = np.trunc(ratings[idx] + delta)
+        if history:
+            after[rated[batch]] = ratings[np.column_stack([w, l])]
+
+    if history:
+        slots = np.concatenate([winners, losers], axis=1)
+        after[rated] = np.where(slots == scratch, -1, after[rated])
+        return ratings[:scratch], wins, losses, draws, after
+    return ratings[:scratch], wins, losses, draws
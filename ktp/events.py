@@ -0,0 +1,160 @@
+import json
+from datetime import datetime, time
+
+import numpy as np
+
+from ktp.elo import DOUBLE, DRAW, INITIAL_POINTS, SINGLE, batch_elo, calculate_double_elo, calculate_elo
+
+# 이벤트 종류별 players 구성
+#   single:       [승자, 패자]
+#   double:       [승자1, 승자2, 패자1, 패자2]
+#   draw:         [A, B] 또는 [A1, A2, B1, B2]
+#   championship: [우승자]          value = 추가 랭킹 포인트
+#   add:          [플레이어]        value = 게스트 여부
+#   remove:       [플레이어]
+EVENT_KINDS = ('single', 'double', 'draw', 'championship', 'add', 'remove')
+MATCH_KINDS = ('single', 'double', 'draw')
+# 지울 수 있는 이벤트. 플레이어 추가/삭제를 지우면 이후 기록의 플레이어가 사라지므로 지울 수 없다
+DELETABLE_KINDS = MATCH_KINDS + ('championship',)
+
+STAT_COLUMNS = ['Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships', 'Guest']
+
+# 이 개수만큼 이벤트가 쌓일 때마다 전체 상태를 스냅샷으로 저장
+SNAPSHOT_INTERVAL = 1000
+
+
+def new_player(guest=False):
+    return {
+        'Ranking Points': INITIAL_POINTS,
+        'Wins': 0,
+        'Losses': 0,
+        'Draws': 0,
+        'Championships': 0,
+        'Guest': bool(guest),
+    }
+
+
+# 경기 날짜를 이벤트 정렬 키로 사용하는 타임스탬프로 변환
+def match_timestamp(match_date=None):
+    now = datetime.now()
+    if match_date is not None:
+        now = datetime.combine(match_date, now.time())
+    return now.isoformat(timespec='seconds')
+
+
+# 가입 날짜를 그날 첫 순간의 타임스탬프로 변환. 그날의 모든 경기보다 앞선다
+def joined_timestamp(joined_date):
+    return datetime.combine(joined_date, time.min).isoformat(timespec='seconds')
+
+
+# 이벤트 하나를 상태(dict: 플레이어 -> 기록)에 적용하고 바뀐 플레이어 목록을 돌려준다.
+# 플레이어는 add 로만 생긴다. 먼저 validate_event 로 확인해야 한다
+def apply_event(state, kind, players, value=0):
+    if kind == 'add':
+        state[players[0]] = new_player(value)
+    elif kind == 'remove':
+        state.pop(players[0], None)
+    elif kind == 'championship':
+        champion = state[players[0]]
+        champion['Championships'] += 1
+        champion['Ranking Points'] += value
+    elif kind == 'draw':
+        # 무승부는 기록만 남기고 랭킹 포인트는 바꾸지 않는다
+        for player in players:
+            state[player]['Draws'] += 1
+    elif kind == 'single':
+        winner = state[players[0]]
+        loser = state[players[1]]
+        winner['Wins'] += 1
+        loser['Losses'] += 1
+        winner['Ranking Points'], loser['Ranking Points'] = calculate_elo(
+            winner['Ranking Points'], loser['Ranking Points'])
+    elif kind == 'double':
+        winners = [state[p] for p in players[:2]]
+        losers = [state[p] for p in players[2:]]
+        for player in winners:
+            player['Wins'] += 1
+        for player in losers:
+            player['Losses'] += 1
+        new_winner_rps, new_loser_rps = calculate_double_elo(
+            [p['Ranking Points'] for p in winners], [p['Ranking Points'] for p in losers])
+        for player, new_rp in zip(winners + losers, new_winner_rps + new_loser_rps):
+            player['Ranking Points'] = new_rp
+    else:
+        raise ValueError(f'Unknown event kind: {kind}')
+    return list(players)
+
+
+# 경기 이벤트 여러 개를 batch_elo 로 한 번에 적용한다. (kind, players) 목록을 순서대로 받는다.
+# history=True 면 경기마다 players 순서대로의 직후 랭킹 포인트 목록도 돌려준다 (무승부는 None)
+def apply_matches_batch(state, matches, history=False):
+    names = list(state)
+    index = {name: i for i, name in enumerate(names)}
+    for _, players in matches:
+        for player in players:
+            if player not in index:
+                raise ValueError(f'Unknown player: {player}')
+
+    winners = np.full((len(matches), 2), -1, dtype=np.int64)
+    losers = np.full((len(matches), 2), -1, dtype=np.int64)
+    match_types = np.empty(len(matches), dtype=np.int64)
+    for i, (kind, players) in enumerate(matches):
+        ids = [index[p] for p in players]
+        half = len(ids) // 2
+        winners[i, :half] = ids[:half]
+        losers[i, :half] = ids[half:]
+        match_types[i] = {'single': SINGLE, 'double': DOUBLE, 'draw': DRAW}[kind]
+
+    ratings = [state[name]['Ranking Points'] for name in names]
+    ratings, wins, losses, draws, after = batch_elo(ratings, winners, losers, match_types, history=True)
+    touched = np.unique(np.concatenate([winners.ravel(), losers.ravel()]))
+    changed = []
+    for i in touched[touched >= 0].tolist():
+        row = state[names[i]]
+        row['Ranking Points'] = int(ratings[i])
+        row['Wins'] += int(wins[i])
+        row['Losses'] += int(losses[i])
+        row['Draws'] += int(draws[i])
+        changed.append(names[i])
+    if history:
+        # 행은 [승자1, 승자2, 패자1, 패자2]. 점수는 음수일 수 있으므로 빈 자리(-1)는 경기 크기로 건너뛴다
+        after = [
+            None if kind == 'draw' else [int(rp) for rp in row[:len(players) // 2] + row[2:2 + len(players) // 2]]
+            for (kind, players), row in zip(matches, after.tolist())
+        ]
+        return changed, after
+    return changed
+
+
+# 이벤트 입력값 검증. state 는 현재 플레이어 기록
+def validate_event(state, kind, players):
+    if kind not in EVENT_KINDS:
+        raise ValueError(f'Unknown event kind: {kind}')
+    expected = {'single': (2,), 'double': (4,), 'draw': (2, 4)}.get(kind, (1,))
+    if len(players) not in expected:
+        raise ValueError(f'{kind} event needs {" or ".join(map(str, expected))} players')
+    if len(set(players)) != len(players):
+        raise ValueError('Each player should be unique in a match.')
+    if kind == 'add':
+        if players[0] in state:
+            raise ValueError(f'Player {players[0]} already exists.')
+        return
+    missing = [p for p in players if p not in state]
+    if missing:
+        raise ValueError(f'Unknown player: {", ".join(missing)}')
+
+
+# 스냅샷은 {플레이어: [RP, 승, 패, 무, 우승, 게스트]} 형태로 압축 저장
+def dump_state(state):
+    return json.dumps(
+        {name: [int(row[c]) for c in STAT_COLUMNS] for name, row in state.items()},
+        ensure_ascii=False, separators=(',', ':'))
+
+
+def load_state(text):
+    state = {}
+    for name, values in json.loads(text).items():
+        row = dict(zip(STAT_COLUMNS, values))
+        row['Guest'] = bool(row['Guest'])
+        state[name] = row
+    return state
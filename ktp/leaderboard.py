@@ -0,0 +1,182 @@
+import html
+import threading
+from bisect import bisect_left, insort
+
+import pandas as pd
+
+from ktp.assets import crown_icons
+from ktp.leagues import get_registry
+from ktp.metrics import span, timed
+
+TABLE_COLUMNS = ['Rank', 'Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships']
+
+
+# 메모리에 올려둔 랭킹. 저장소에서 바뀐 행만 받아서 정렬된 위치만 옮긴다
+class Leaderboard:
+    def __init__(self, storage):
+        self.storage = storage
+        self.version = -1
+        self.players = {}
+        self._lock = threading.RLock()
+        self._ranked = []   # (-랭킹 포인트, 추가 순서, 이름) 로 정렬된 일반 플레이어
+        self._guests = []   # 이름순 게스트
+        self._keys = {}
+        self._names = []    # 검색용 (소문자 이름, 이름)
+
+    def _key(self, name, row):
+        return (-int(row['Ranking Points']), row['Order'], name)
+
+    def _remove(self, name):
+        row = self.players.pop(name)
+        self._names.pop(bisect_left(self._names, (name.casefold(), name)))
+        if row['Guest']:
+            self._guests.pop(bisect_left(self._guests, name))
+        else:
+            key = self._keys.pop(name)
+            self._ranked.pop(bisect_left(self._ranked, key))
+
+    def _insert(self, name, row):
+        self.players[name] = row
+        insort(self._names, (name.casefold(), name))
+        if row['Guest']:
+            insort(self._guests, name)
+        else:
+            key = self._key(name, row)
+            self._keys[name] = key
+            insort(self._ranked, key)
+
+    # 저장소의 데이터 버전을 따라잡는다. 삭제가 있었으면 전체를 다시 읽는다
+    def refresh(self):
+        with self._lock:
+            if self.storage.data_version() == self.version:
+                return self.version
+            with span('leaderboard.refresh'):
+                since = self.version
+                version, changes, removed = self.storage.load_changes(since)
+                if removed or since < 0:
+                    version, changes, _ = self.storage.load_changes(-1)
+                    self.players, self._ranked, self._guests, self._keys, self._names = {}, [], [], {}, []
+                for name, row in changes.items():
+                    if name in self.players:
+                        self._remove(name)
+                    self._insert(name, row)
+                self.version = version
+            return version
+
+    # 이벤트를 기록하고 바뀐 플레이어만 다시 정렬한다
+    def record(self, kind, players, value=0, played_at=None):
+        seq = self.storage.append_event(kind, players, value, played_at)
+        self.refresh()
+        return seq
+
+    def delete_event(self, seq):
+        self.storage.delete_event(seq)
+        self.refresh()
+
+    # 추가된 순서대로의 플레이어 이름
+    def names(self):
+        with self._lock:
+            return sorted(self.players, key=lambda name: self.players[name]['Order'])
+
+    def guest_names(self):
+        with self._lock:
+            return list(self._guests)
+
+    # 순위대로의 행 목록. 정렬은 하지 않고 이미 정렬된 순서를 그대로 쓴다
+    def rows(self, include_guests=True):
+        with self._lock:
+            rows = []
+            for rank, (_, _, name) in enumerate(self._ranked, start=1):
+                rows.append({'Rank': rank, 'Player': name, **self.players[name]})
+            if include_guests:
+                for number, name in enumerate(self._guests, start=1):
+                    rows.append({'Rank': f'G{number}', 'Player': name, **self.players[name]})
+        for row in rows:
+            del row['Order']
+        return rows
+
+    # 전체 순서(일반 플레이어 다음 게스트)에서의 위치
+    def _position(self, name):
+        if self.players[name]['Guest']:
+            return len(self._ranked) + bisect_left(self._guests, name)
+        return bisect_left(self._ranked, self._keys[name])
+
+    def _row_at(self, position):
+        ranked = len(self._ranked)
+        if position < ranked:
+            name, rank = self._ranked[position][2], position + 1
+        else:
+            name, rank = self._guests[position - ranked], f'G{position - ranked + 1}'
+        row = {'Rank': rank, 'Player': name, **self.players[name]}
+        del row['Order']
+        return row
+
+    # 플레이어 한 명의 기록과 순위. 정렬된 목록에서 이진 탐색으로 순위를 찾는다
+    def row(self, name):
+        with self._lock:
+            if name not in self.players:
+                return None
+            return self._row_at(self._position(name))
+
+    def count(self, include_guests=True):
+        with self._lock:
+            return len(self._ranked) + (len(self._guests) if include_guests else 0)
+
+    # 순위 start 번째(0부터)부터 count 개 행. 정렬된 목록을 잘라 쓰므로 전체를 읽거나 정렬하지 않는다
+    def window(self, start, count, include_guests=True):
+        with self._lock:
+            end = min(start + count, self.count(include_guests))
+            return [self._row_at(position) for position in range(max(start, 0), end)]
+
+    # 이름이 query 로 시작하는 플레이어 수와, 그중 순위대로 offset 번째(0부터)부터 limit 명 (대소문자 무시).
+    # 이름 색인에서 이진 탐색으로 찾은 모든 플레이어의 위치를 정렬한 뒤 자른다
+    def search(self, query, offset=0, limit=25, include_guests=True):
+        key = query.strip().casefold()
+        with self._lock:
+            positions = []
+            i = bisect_left(self._names, (key,))
+            while i < len(self._names) and self._names[i][0].startswith(key):
+                name = self._names[i][1]
+                if include_guests or not self.players[name]['Guest']:
+                    positions.append(self._position(name))
+                i += 1
+            positions.sort()
+            offset = max(offset, 0)
+            return len(positions), [self._row_at(position) for position in positions[offset:offset + limit]]
+
+    # 행 목록의 표와 HTML. 이름은 이스케이프하고 1, 2, 3등에는 왕관 아이콘을 붙인다
+    def table(self, rows):
+        table = pd.DataFrame(rows, columns=TABLE_COLUMNS)
+        table['Player'] = table['Player'].map(html.escape)
+        crowns = crown_icons()
+        for i, row in enumerate(rows):
+            if isinstance(row['Rank'], int) and row['Rank'] <= len(crowns):
+                table.at[i, 'Player'] += f' {crowns[row["Rank"] - 1]}'
+        with span('leaderboard.to_html'):
+            return table, table.to_html(escape=False, index=False)
+
+    # 전체 순위 표와 HTML
+    @timed('leaderboard.build_table')
+    def build_table(self):
+        return self.table(self.rows())
+
+    # 한 페이지의 표와 HTML. 페이지 크기가 같으면 리그 크기와 상관없이 같은 양만 만든다
+    @timed('leaderboard.build_page')
+    def build_page(self, start, count, include_guests=True):
+        return self.table(self.window(start, count, include_guests))
+
+
+_leaderboards = {}
+_leaderboard_lock = threading.Lock()
+
+
+# 프로세스 전체에서 공유하는 랭킹. 리그의 현재 시즌(파티션)마다 하나씩 둔다
+def get_leaderboard(league=None):
+    storage = get_registry().storage_for(league)
+    board = _leaderboards.get(storage.path)
+    if board is None:
+        with _leaderboard_lock:
+            board = _leaderboards.get(storage.path)
+            if board is None:
+                board = _leaderboards[storage.path] = Leaderboard(storage)
+    return board
@@ -0,0 +1,125 @@
+import os
+import re
+import threading
+
+import pandas as pd
+
+from ktp.elo import INITIAL_POINTS
+from ktp.storage import BACKENDS, get_storage
+
+# 리그와 시즌. 리그-시즌 하나가 DB 파일 하나(파티션)이고, 목록은 기본 저장소의 leagues/seasons 테이블에 둔다.
+# 기본 리그의 첫 시즌은 기존 DB 파일을 그대로 쓰고, 나머지는 leagues/<리그>-s<시즌>.db
+#   KTP_LEAGUE   기본 리그 이름
+
+DEFAULT_LEAGUE = os.environ.get('KTP_LEAGUE', 'ktp')
+DEFAULT_TITLE = 'League of KTP'
+LEAGUE_DIR = 'leagues'
+_NAME = re.compile(r'^[A-Za-z0-9_-]{1,40}$')
+
+
+# 리그/시즌 목록과 파티션 저장소. 목록은 메모리에 두고 leagues_version 이 바뀌면 다시 읽는다
+class LeagueRegistry:
+    def __init__(self, storage):
+        self.storage = storage
+        self.version = None
+        self._leagues = {}
+        self._partitions = {}
+        self._lock = threading.RLock()
+        if not storage.load_leagues():
+            storage.add_league(DEFAULT_LEAGUE, DEFAULT_TITLE, os.path.basename(storage.path))
+
+    def _base_dir(self):
+        return os.path.dirname(os.path.abspath(self.storage.path))
+
+    def refresh(self):
+        version = self.storage.leagues_version()
+        if version != self.version:
+            with self._lock:
+                self._leagues = {row['league']: row for row in self.storage.load_leagues()}
+                self.version = version
+        return self._leagues
+
+    def names(self):
+        return list(self.refresh())
+
+    def get(self, league=None):
+        league = league or DEFAULT_LEAGUE
+        info = self.refresh().get(league)
+        if info is None:
+            raise ValueError(f'Unknown league: {league}')
+        return info
+
+    # 파티션 저장소. 열어 둔 DB 는 다시 쓴다
+    def _open(self, path):
+        path = os.path.join(self._base_dir(), path)
+        if os.path.abspath(path) == os.path.abspath(self.storage.path):
+            return self.storage
+        with self._lock:
+            storage = self._partitions.get(path)
+            if storage is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                storage = BACKENDS[os.environ.get('KTP_STORAGE', 'sqlite')](path)
+                self._partitions[path] = storage
+        return storage
+
+    # 리그의 현재 시즌 저장소
+    def storage_for(self, league=None):
+        return self._open(self.get(league)['path'])
+
+    def _partition_path(self, league, season):
+        return f'{LEAGUE_DIR}/{league}-s{season}.db'
+
+    def create_league(self, league, title=None):
+        if not _NAME.match(league or ''):
+            raise ValueError('League name should be 1-40 letters, digits, - or _.')
+        path = self._partition_path(league, 1)
+        if not self.storage.add_league(league, title or league, path):
+            raise ValueError(f'League {league} already exists.')
+        self._open(path)
+
+    # 현재 시즌을 끝내고 최종 순위를 보관한 뒤 새 시즌을 시작한다.
+    # 새 시즌은 같은 플레이어로 초기 점수에서 시작하고, 지난 시즌 DB 는 건드리지 않는다.
+    # 새 시즌 DB 를 채운 뒤 목록을 바꾸기 전에 멈췄으면, 다시 실행할 때 채운 것을 그대로 쓰고 목록만 마저 바꾼다
+    def rollover(self, league=None, standings=None):
+        info = self.get(league)
+        league, season = info['league'], info['season']
+        old = self._open(info['path'])
+        players = old.load_players()
+        if standings is None:
+            standings = players.sort_values('Ranking Points', ascending=False, kind='stable').to_dict('records')
+        path = self._partition_path(league, season + 1)
+        new = self._open(path)
+        if not new.load_events(limit=1).empty:
+            raise ValueError(f'Season {season + 1} of {league} has already started.')
+        if new.load_players().empty:
+            new.upsert_players(pd.DataFrame({
+                'Player': players['Player'],
+                'Ranking Points': INITIAL_POINTS,
+                'Wins': 0,
+                'Losses': 0,
+                'Draws': 0,
+                'Championships': 0,
+                'Guest': players['Guest'],
+            }))
+        self.storage.start_season(league, season, path, standings)
+        return season + 1
+
+    def seasons(self, league=None):
+        return self.storage.load_seasons(self.get(league)['league'])
+
+    # 끝난 시즌의 최종 순위
+    def standings(self, league, season):
+        return self.storage.load_standings(self.get(league)['league'], season)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = LeagueRegistry(get_storage())
+    return _registry
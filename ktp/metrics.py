@@ -0,0 +1,150 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+# 실행 시간 측정. 구간(span)마다 프로세스 전체의 횟수/합계/최대를 모으고,
+# 스트림릿 실행(rerun) 하나 동안의 구간과 카운터는 따로 모아 최근 RUN_HISTORY 개를 보관한다
+#   with span('storage.load_events'): ...
+#   @timed('leaderboard.build_table')
+#   count('cache.hit')
+RUN_HISTORY = 20
+
+# 프로파일 결과로 보여줄 함수 개수
+PROFILE_LINES = 40
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.spans = {}     # 이름 -> [횟수, 합계(초), 최대(초)]
+        self.counters = {}
+        self.runs = deque(maxlen=RUN_HISTORY)
+
+    def _current(self):
+        return getattr(self._local, 'run', None)
+
+    # 따로 잰 시간(초)을 구간 누적에 더한다
+    def observe(self, name, elapsed):
+        with self._lock:
+            total = self.spans.get(name)
+            if total is None:
+                self.spans[name] = [1, elapsed, elapsed]
+            else:
+                total[0] += 1
+                total[1] += elapsed
+                total[2] = max(total[2], elapsed)
+
+    # 구간 하나의 시간을 잰다. 실행 중이면 시작 순서와 깊이도 같이 남긴다
+    @contextmanager
+    def span(self, name):
+        run = self._current()
+        entry = None
+        if run is not None:
+            entry = [name, run['depth'], 0.0]
+            run['spans'].append(entry)
+            run['depth'] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if entry is not None:
+                entry[2] = elapsed
+                run['depth'] -= 1
+            self.observe(name, elapsed)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+        run = self._current()
+        if run is not None:
+            run['counters'][name] = run['counters'].get(name, 0) + n
+
+    # 실행 하나. 이 스레드에서 재는 구간과 카운터가 이 실행에 모인다.
+    # profile=True 면 cProfile 로 이 실행 전체를 같이 잰다
+    @contextmanager
+    def run(self, label='rerun', profile=False):
+        run = {'label': label, 'started_at': datetime.now().isoformat(timespec='seconds'),
+               'depth': 0, 'spans': [], 'counters': {}, 'total': 0.0, 'profile': None}
+        self._local.run = run
+        profiler = cProfile.Profile() if profile else None
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield run
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                buffer = io.StringIO()
+                pstats.Stats(profiler, stream=buffer).sort_stats('cumulative').print_stats(PROFILE_LINES)
+                run['profile'] = buffer.getvalue()
+            run['total'] = time.perf_counter() - started
+            self._local.run = None
+            self.observe(f"run.{run['label']}", run['total'])
+            with self._lock:
+                self.runs.append(run)
+
+    # 실행 중에 정해지는 이름(예: 페이지)
+    def label(self, label):
+        run = self._current()
+        if run is not None:
+            run['label'] = label
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'spans': {name: list(total) for name, total in self.spans.items()},
+                'counters': dict(self.counters),
+                'runs': list(self.runs),
+            }
+
+    # Prometheus 텍스트 형식
+    def prometheus(self):
+        snapshot = self.snapshot()
+        lines = [
+            '# HELP ktp_span_seconds Time spent in instrumented code.',
+            '# TYPE ktp_span_seconds summary',
+        ]
+        for name, (n, total, _) in sorted(snapshot['spans'].items()):
+            lines.append(f'ktp_span_seconds_count{{span="{_label(name)}"}} {n}')
+            lines.append(f'ktp_span_seconds_sum{{span="{_label(name)}"}} {total:.6f}')
+        lines += ['# HELP ktp_span_max_seconds Slowest single call.', '# TYPE ktp_span_max_seconds gauge']
+        for name, (_, _, longest) in sorted(snapshot['spans'].items()):
+            lines.append(f'ktp_span_max_seconds{{span="{_label(name)}"}} {longest:.6f}')
+        lines += ['# HELP ktp_events_total Counted events.', '# TYPE ktp_events_total counter']
+        for name, n in sorted(snapshot['counters'].items()):
+            lines.append(f'ktp_events_total{{name="{_label(name)}"}} {n}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.spans, self.counters = {}, {}
+            self.runs.clear()
+
+
+metrics = Metrics()
+span = metrics.span
+count = metrics.count
+
+
+# 함수 전체를 구간 하나로 잰다
+def timed(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from ktp.metrics import timed
+
+# 저장되는 비밀번호 해시 형식
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>        기본
+#   pbkdf2_sha256$<반복 횟수>$<salt>$<hash>
+#   64자리 16진수                            예전 방식(솔트 없는 SHA-256). 로그인에 성공하면 새 형식으로 바꾼다
+# salt, hash 는 base64. 비용은 환경 변수로 바꿀 수 있다
+#   KTP_PASSWORD_SCHEME    scrypt | pbkdf2_sha256
+#   KTP_SCRYPT_N           scrypt 비용 (2의 거듭제곱)
+#   KTP_PBKDF2_ITERATIONS  PBKDF2 반복 횟수
+#   KTP_AUTH_WORKERS       해시 계산 스레드 수
+SCHEMES = ('scrypt', 'pbkdf2_sha256')
+DEFAULT_SCHEME = 'scrypt'
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600_000
+AUTH_WORKERS = 2
+SALT_BYTES = 16
+
+# UserID 하나당 WINDOW 초 동안 허용하는 로그인 시도 횟수
+LOGIN_ATTEMPTS = 5
+LOGIN_WINDOW = 60
+
+
+class TooManyAttempts(RuntimeError):
+    pass
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+def _is_legacy(stored):
+    return len(stored) == 64 and all(c in '0123456789abcdef' for c in stored)
+
+
+# 형식 문자열의 파라미터로 키를 만든다. hashlib 의 scrypt/pbkdf2 는 계산 중 GIL 을 놓는다
+def _derive(scheme, params, password, salt):
+    if scheme == 'scrypt':
+        n, r, p = params
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 1024 * 1024, dklen=32)
+    if scheme == 'pbkdf2_sha256':
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, params[0])
+    raise ValueError(f'Unknown password scheme: {scheme}')
+
+
+# 비밀번호 해싱과 검증. 계산은 크기가 정해진 스레드 풀에서 해서 동시에 몰려도 CPU 사용이 늘지 않는다
+class PasswordHasher:
+    def __init__(self, scheme=None, scrypt_n=None, pbkdf2_iterations=None, workers=None):
+        self.scheme = scheme or os.environ.get('KTP_PASSWORD_SCHEME', DEFAULT_SCHEME)
+        if self.scheme not in SCHEMES:
+            raise ValueError(f'Unknown password scheme: {self.scheme}')
+        self.scrypt_n = int(scrypt_n or os.environ.get('KTP_SCRYPT_N', SCRYPT_N))
+        self.pbkdf2_iterations = int(pbkdf2_iterations or os.environ.get('KTP_PBKDF2_ITERATIONS', PBKDF2_ITERATIONS))
+        self.workers = int(workers or os.environ.get('KTP_AUTH_WORKERS', AUTH_WORKERS))
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='ktp-auth')
+
+    def _params(self):
+        if self.scheme == 'scrypt':
+            return (self.scrypt_n, SCRYPT_R, SCRYPT_P)
+        return (self.pbkdf2_iterations,)
+
+    def _hash(self, password):
+        params = self._params()
+        salt = secrets.token_bytes(SALT_BYTES)
+        key = _derive(self.scheme, params, password, salt)
+        return '$'.join([self.scheme, *map(str, params), _b64(salt), _b64(key)])
+
+    def _verify(self, password, stored):
+        if _is_legacy(stored):
+            return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+        scheme, *fields = stored.split('$')
+        try:
+            *params, salt, key = fields
+            params = tuple(map(int, params))
+            salt, key = base64.b64decode(salt), base64.b64decode(key)
+        except ValueError:
+            return False
+        return hmac.compare_digest(_derive(scheme, params, password, salt), key)
+
+    @timed('auth.hash')
+    def hash(self, password):
+        return self._pool.submit(self._hash, password).result()
+
+    @timed('auth.verify')
+    def verify(self, password, stored):
+        if not stored:
+            return False
+        return self._pool.submit(self._verify, password, stored).result()
+
+    # 예전 형식이거나 현재 설정과 비용이 다르면 다시 해싱해야 한다
+    def needs_rehash(self, stored):
+        if _is_legacy(stored):
+            return True
+        scheme, *fields = stored.split('$')
+        return scheme != self.scheme or fields[:-2] != list(map(str, self._params()))
+
+    def shutdown(self):
+        self._pool.shutdown()
+
+
+# UserID 별 로그인 시도 제한. 최근 window 초 동안의 시도 시각만 기억한다
+class LoginRateLimiter:
+    def __init__(self, attempts=LOGIN_ATTEMPTS, window=LOGIN_WINDOW):
+        self.attempts = attempts
+        self.window = window
+        self._history = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        for userid in [u for u, times in self._history.items() if now - times[-1] >= self.window]:
+            del self._history[userid]
+
+    # 시도를 기록한다. 한도를 넘었으면 TooManyAttempts
+    def hit(self, userid):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._history) > 10_000:
+                self._prune(now)
+            times = self._history.setdefault(userid, deque())
+            while times and now - times[0] >= self.window:
+                times.popleft()
+            if len(times) >= self.attempts:
+                raise TooManyAttempts(f'Too many login attempts. Try again in {int(self.window - (now - times[0])) + 1}s.')
+            times.append(now)
+
+    # 로그인에 성공하면 기록을 지운다
+    def reset(self, userid):
+        with self._lock:
+            self._history.pop(userid, None)
+
+
+_hasher = None
+_limiter = LoginRateLimiter()
+_hasher_lock = threading.Lock()
+
+
+def get_hasher():
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher()
+    return _hasher
+
+
+def get_rate_limiter():
+    return _limiter
+
+
+def hash_password(password):
+    return get_hasher().hash(password)
@@ -0,0 +1,193 @@
+import math
+
+import numpy as np
+
+from ktp.elo import DRAW, INITIAL_POINTS, batch_elo
+
+# 바꿔 끼울 수 있는 레이팅 계산 방식. 모든 방식은 같은 배열 형식을 쓴다
+#   state:       {이름: 플레이어 번호별 배열} 형태의 레이팅 상태
+#   winners:     (n, 2) 승자 번호. 단식은 두 번째 칸이 -1 (무승부면 한쪽 팀)
+#   losers:      (n, 2) 패자 번호
+#   match_types: SINGLE / DOUBLE / DRAW
+
+
+def _pad(players):
+    players = np.asarray(players, dtype=np.int64)
+    if players.ndim == 1:
+        players = players[:, None]
+    if players.shape[1] == 1:
+        players = np.column_stack([players, np.full(len(players), -1)])
+    return players
+
+
+# 팀 평균. 단식의 빈 자리(-1)는 빼고 계산한다
+def _team_mean(values, players):
+    present = players >= 0
+    picked = np.where(present, values[np.where(present, players, 0)], 0.0)
+    return picked.sum(axis=1) / present.sum(axis=1)
+
+
+class RatingSystem:
+    name = None
+
+    # n 명의 초기 상태
+    def new_state(self, n):
+        raise NotImplementedError
+
+    # 상태에 플레이어를 추가한다
+    def grow(self, state, n):
+        fresh = self.new_state(n - len(self.points(state)))
+        return {key: np.concatenate([state[key], fresh[key]]) for key in state}
+
+    # 경기 전 상태로 본 winners 쪽의 승리 확률
+    def predict(self, state, winners, losers):
+        raise NotImplementedError
+
+    # 한 레이팅 기간의 경기들을 적용한 새 상태
+    def update(self, state, winners, losers, match_types):
+        raise NotImplementedError
+
+    # 화면에 보여줄 랭킹 포인트
+    def points(self, state):
+        raise NotImplementedError
+
+
+# 지금 리그가 쓰는 Elo. 기간 안의 경기도 순서대로 적용한 것과 같다
+class EloSystem(RatingSystem):
+    name = 'elo'
+
+    def new_state(self, n):
+        return {'rating': np.full(n, INITIAL_POINTS, dtype=np.int64)}
+
+    def predict(self, state, winners, losers):
+        rating = state['rating'].astype(float)
+        diff = _team_mean(rating, _pad(losers)) - _team_mean(rating, _pad(winners))
+        return 1 / (1 + 10 ** (diff / 400))
+
+    def update(self, state, winners, losers, match_types):
+        rating, _, _, _ = batch_elo(state['rating'], _pad(winners), _pad(losers), match_types)
+        return {'rating': rating}
+
+    def points(self, state):
+        return state['rating']
+
+
+# Glicko-2 (Glickman, 2012). 기간 안의 모든 경기를 한 번에 계산한다.
+# 복식은 팀을 한 명처럼 본다: 팀 레이팅은 평균, 팀 RD 는 제곱 평균의 제곱근.
+# 기대 승률은 팀끼리 계산하고, 변화량은 각자의 RD 로 정해지므로 새로 온 플레이어가 더 빨리 움직인다
+class Glicko2System(RatingSystem):
+    name = 'glicko2'
+    SCALE = 173.7178
+
+    def __init__(self, initial=INITIAL_POINTS, rd=350.0, volatility=0.06, tau=0.5, epsilon=1e-6):
+        self.initial = initial
+        self.rd = rd
+        self.volatility = volatility
+        self.tau = tau
+        self.epsilon = epsilon
+
+    def new_state(self, n):
+        return {
+            'mu': np.zeros(n),
+            'phi': np.full(n, self.rd / self.SCALE),
+            'sigma': np.full(n, self.volatility),
+        }
+
+    @staticmethod
+    def _g(phi):
+        return 1 / np.sqrt(1 + 3 * phi ** 2 / math.pi ** 2)
+
+    def _team(self, state, players):
+        mu = _team_mean(state['mu'], players)
+        phi = np.sqrt(_team_mean(state['phi'] ** 2, players))
+        return mu, phi
+
+    def predict(self, state, winners, losers):
+        w_mu, w_phi = self._team(state, _pad(winners))
+        l_mu, l_phi = self._team(state, _pad(losers))
+        return 1 / (1 + np.exp(-self._g(np.sqrt(w_phi ** 2 + l_phi ** 2)) * (w_mu - l_mu)))
+
+    # 변동성 갱신 (Illinois 방법). 플레이어별 방정식을 배열로 한꺼번에 푼다
+    def _volatility(self, phi, sigma, v, delta):
+        a = np.log(sigma ** 2)
+        tau = self.tau
+
+        def f(x):
+            ex = np.exp(x)
+            return ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2) - (x - a) / tau ** 2
+
+        big = delta ** 2 > phi ** 2 + v
+        B = np.where(big, np.log(np.where(big, delta ** 2 - phi ** 2 - v, 1)), a - tau)
+        k = np.ones_like(a)
+        low = ~big & (f(B) < 0)
+        while low.any():
+            k[low] += 1
+            B = np.where(low, a - k * tau, B)
+            low &= f(B) < 0
+        A = a
+        fA, fB = f(A), f(B)
+        active = np.abs(B - A) > self.epsilon
+        for _ in range(100):
+            if not active.any():
+                break
+            C = A + (A - B) * fA / (fB - fA)
+            fC = f(C)
+            flip = fC * fB <= 0
+            A, fA = np.where(active & flip, B, A), np.where(active & flip, fB, np.where(active, fA / 2, fA))
+            B, fB = np.where(active, C, B), np.where(active, fC, fB)
+            active &= np.abs(B - A) > self.epsilon
+        return np.exp(A / 2)
+
+    def update(self, state, winners, losers, match_types):
+        winners, losers = _pad(winners), _pad(losers)
+        scores = np.where(np.asarray(match_types) == DRAW, 0.5, 1.0)
+        mu, phi, sigma = state['mu'], state['phi'], state['sigma']
+        w_mu, w_phi = self._team(state, winners)
+        l_mu, l_phi = self._team(state, losers)
+
+        # 선수 한 명이 한 경기에 나온 것을 한 줄로 편다: (선수, 우리 팀, 상대 팀, 점수)
+        rows = []
+        for slot in range(2):
+            rows.append((winners[:, slot], w_mu, l_mu, l_phi, scores))
+            rows.append((losers[:, slot], l_mu, w_mu, w_phi, 1 - scores))
+        player, own_mu, opp_mu, opp_phi, score = (np.concatenate(parts) for parts in zip(*rows))
+        keep = player >= 0
+        player, own_mu, opp_mu, opp_phi, score = player[keep], own_mu[keep], opp_mu[keep], opp_phi[keep], score[keep]
+
+        g = self._g(opp_phi)
+        expected = 1 / (1 + np.exp(-g * (own_mu - opp_mu)))
+        n = len(mu)
+        info = np.bincount(player, g ** 2 * expected * (1 - expected), minlength=n)
+        improvement = np.bincount(player, g * (score - expected), minlength=n)
+
+        played = info > 0
+        new_mu, new_phi, new_sigma = mu.copy(), np.sqrt(phi ** 2 + sigma ** 2), sigma.copy()
+        v = 1 / info[played]
+        delta = v * improvement[played]
+        sigma_p = self._volatility(phi[played], sigma[played], v, delta)
+        phi_star = np.sqrt(phi[played] ** 2 + sigma_p ** 2)
+        phi_p = 1 / np.sqrt(1 / phi_star ** 2 + 1 / v)
+        new_mu[played] = mu[played] + phi_p ** 2 * improvement[played]
+        new_phi[played] = phi_p
+        new_sigma[played] = sigma_p
+        # 오래 쉬어도 RD 는 처음 값보다 커지지 않는다
+        new_phi = np.minimum(new_phi, self.rd / self.SCALE)
+        return {'mu': new_mu, 'phi': new_phi, 'sigma': new_sigma}
+
+    def points(self, state):
+        return np.trunc(self.initial + self.SCALE * state['mu']).astype(np.int64)
+
+    def deviations(self, state):
+        return self.SCALE * state['phi']
+
+
+RATING_SYSTEMS = {
+    'elo': EloSystem,
+    'glicko2': Glicko2System,
+}
+
+
+def get_rating_system(name='elo', **options):
+    if name not in RATING_SYSTEMS:
+        raise ValueError(f'Unknown rating system: {name}')
+    return RATING_SYSTEMS[name](**options)
@@ -0,0 +1,195 @@
+import hashlib
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+from ktp.metrics import timed
+from ktp.storage import get_storage
+
+# 업로드한 경기 스크린샷과 썸네일. 목록은 저장소의 screenshots 테이블에서 읽고 폴더는 훑지 않는다.
+# 새 업로드는 내용의 sha256 을 파일 이름으로 저장하므로 같은 사진은 파일 하나를 같이 쓴다
+#   KTP_SCREENSHOTS           저장 폴더
+#   KTP_MAX_UPLOAD_MB         업로드 최대 크기
+#   KTP_SCREENSHOT_REENCODE   webp 또는 jpeg 로 지정하면 저장할 때 다시 인코딩한다 (Pillow 필요)
+SCREENSHOT_DIR = os.environ.get('KTP_SCREENSHOTS', 'screenshots')
+THUMBNAIL_DIR = 'thumbnails'
+THUMBNAIL_SIZE = 320
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+MAX_UPLOAD_MB = float(os.environ.get('KTP_MAX_UPLOAD_MB', 10))
+REENCODE_FORMAT = os.environ.get('KTP_SCREENSHOT_REENCODE', '').lower()
+REENCODE_SIZE = 2048
+CHUNK_SIZE = 1024 * 1024
+_FORMATS = {'webp': ('WEBP', '.webp'), 'jpeg': ('JPEG', '.jpg'), 'jpg': ('JPEG', '.jpg')}
+
+
+# 긴 변이 size 가 되도록 줄인 사본을 dest 에 저장하고 원본 크기를 돌려준다
+def _save_resized(path, dest, size, format, quality):
+    from PIL import Image
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            image.draft('RGB', (size, size))  # JPEG 는 줄인 크기로만 디코딩해서 메모리를 덜 쓴다
+            image = image.convert('RGB')
+            image.thumbnail((size, size))
+            image.save(dest, format=format, quality=quality, optimize=True)
+    except OSError:
+        raise ValueError('Not a readable image.')
+    return width, height
+
+
+# 파일 하나를 chunk 단위로 읽어 sha256 을 계산한다
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ScreenshotStore:
+    def __init__(self, storage, directory=SCREENSHOT_DIR, max_bytes=int(MAX_UPLOAD_MB * 1024 * 1024),
+                 reencode=REENCODE_FORMAT):
+        if reencode and reencode not in _FORMATS:
+            raise ValueError(f'Unknown image format: {reencode}')
+        self.storage = storage
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.reencode = reencode
+        self._indexed = False
+        self._lock = threading.Lock()
+
+    def path(self, record):
+        return os.path.join(self.directory, record['Filename'])
+
+    # 썸네일이 없으면 원본 경로
+    def thumbnail_path(self, record):
+        return os.path.join(self.directory, record['Thumbnail'] or record['Filename'])
+
+    def _pillow(self):
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    # 원본 파일(path)로 썸네일을 만들고 색인 행을 만든다. 저장소에는 아직 넣지 않는다
+    def _record(self, path, filename, digest, uploaded_at):
+        record = {
+            'Filename': filename,
+            'Thumbnail': None,
+            'Uploaded At': uploaded_at,
+            'Size': os.path.getsize(path),
+            'SHA256': digest,
+            'Width': None,
+            'Height': None,
+        }
+        if self._pillow():
+            thumbnail = f'{THUMBNAIL_DIR}/{digest[:16]}.jpg'
+            os.makedirs(os.path.join(self.directory, THUMBNAIL_DIR), exist_ok=True)
+            record['Width'], record['Height'] = _save_resized(
+                path, os.path.join(self.directory, thumbnail), THUMBNAIL_SIZE, 'JPEG', 80)
+            record['Thumbnail'] = thumbnail
+        return record
+
+    # 업로드를 chunk 단위로 임시 파일에 쓰면서 해시를 계산한다. max_bytes 를 넘으면 ValueError
+    def _receive(self, fileobj):
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(suffix='.upload', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError(f'File is larger than {self.max_bytes / 1024 / 1024:g} MB.')
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return tmp, digest.hexdigest()
+
+    # 저장 형식으로 바꾼 파일과 확장자. 다시 인코딩하지 않거나 더 커지면 받은 파일 그대로
+    def _encode(self, tmp, ext):
+        if not self.reencode or not self._pillow():
+            return tmp, ext
+        format, encoded_ext = _FORMATS[self.reencode]
+        encoded = f'{tmp}{encoded_ext}'
+        _save_resized(tmp, encoded, REENCODE_SIZE, format, 85)
+        if os.path.getsize(encoded) >= os.path.getsize(tmp):
+            os.remove(encoded)
+            return tmp, ext
+        return encoded, encoded_ext
+
+    # 업로드 저장. fileobj 는 read() 가 되는 파일 객체. (색인 행, 새로 저장했는지) 를 돌려준다
+    @timed('screenshots.save')
+    def save(self, name, fileobj):
+        ext = os.path.splitext(name)[1].lower()
+        if ext not in IMAGE_EXTENSIONS:
+            raise ValueError(f'Unsupported file type: {name}')
+        self.ensure_indexed()
+        tmp, digest = self._receive(fileobj)
+        stored = tmp
+        try:
+            existing = self.storage.find_screenshot(digest)
+            if existing is not None:
+                return existing, False
+            stored, ext = self._encode(tmp, ext)
+            filename = f'{digest}{ext}'
+            record = self._record(stored, filename, digest, datetime.now().isoformat(timespec='seconds'))
+            os.replace(stored, self.path(record))
+            stored = None
+            return self.storage.add_screenshot(record), True
+        finally:
+            for path in {tmp, stored} - {None}:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    # 색인이 생기기 전에 올라온 파일을 한 번만 색인한다. 업로드 시각은 파일 수정 시각
+    def ensure_indexed(self):
+        if self._indexed:
+            return
+        with self._lock:
+            if self._indexed or self.storage.get_meta('screenshots_indexed'):
+                self._indexed = True
+                return
+            if os.path.isdir(self.directory):
+                for entry in sorted(os.scandir(self.directory), key=lambda e: e.name):
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                        uploaded_at = datetime.fromtimestamp(entry.stat().st_mtime).isoformat(timespec='seconds')
+                        try:
+                            self.storage.add_screenshot(
+                                self._record(entry.path, entry.name, _file_digest(entry.path), uploaded_at))
+                        except ValueError:
+                            continue  # 읽을 수 없는 파일은 색인하지 않는다
+            self.storage.set_meta('screenshots_indexed', 1)
+            self._indexed = True
+
+    def latest(self):
+        self.ensure_indexed()
+        records = self.storage.load_screenshots(limit=1)
+        return records[0] if records else None
+
+    def count(self):
+        self.ensure_indexed()
+        return self.storage.count_screenshots()
+
+    # 최근 업로드 순으로 number 번째 페이지 (1부터)
+    def page(self, number, per_page=12):
+        self.ensure_indexed()
+        return self.storage.load_screenshots(limit=per_page, offset=(number - 1) * per_page)
+
+
+_screenshot_store = None
+_screenshot_store_lock = threading.Lock()
+
+
+def get_screenshot_store():
+    global _screenshot_store
+    if _screenshot_store is None:
+        with _screenshot_store_lock:
+            if _screenshot_store is None:
+                _screenshot_store = ScreenshotStore(get_storage())
+    return _screenshot_store
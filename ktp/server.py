@@ -0,0 +1,96 @@
+import json
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from ktp import api
+from ktp.cache import ranking_cache
+from ktp.leaderboard import get_leaderboard
+from ktp.leagues import get_registry
+from ktp.metrics import metrics
+
+# 스코어보드나 스크립트용 읽기 전용 JSON API
+#   GET /rankings[?guests=0]   순위 목록
+#   GET /rankings?offset=0&limit=50[&q=이름]
+#                              순위 한 페이지 {total, offset, rows}. q 는 이름 앞부분 검색
+#   GET /players/<이름>        플레이어 한 명
+#   GET /health
+#   GET /metrics                이 프로세스의 구간별 실행 시간 (Prometheus 텍스트)
+# 모든 요청에 ?league=<이름> 을 붙이면 그 리그의 현재 시즌을 보여준다.
+# 응답에는 리그, 시즌, 데이터 버전을 ETag 로 붙이고, If-None-Match 가 같으면 304 를 돌려준다
+
+
+# 한 번에 돌려주는 최대 행 수
+MAX_PAGE = 500
+
+
+def _rankings_json(include_guests, board):
+    return json.dumps(api.rankings(include_guests, board), ensure_ascii=False).encode()
+
+
+class RankingHandler(BaseHTTPRequestHandler):
+    server_version = 'KTP/1.0'
+
+    def _send(self, status, body=b'', etag=None, content_type='application/json; charset=utf-8'):
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        if body:
+            self.send_header('Content-Type', content_type)
+            self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            return self._send(HTTPStatus.OK, b'{"status":"ok"}')
+        if url.path == '/metrics':
+            return self._send(HTTPStatus.OK, metrics.prometheus().encode(),
+                              content_type='text/plain; version=0.0.4; charset=utf-8')
+        query = parse_qs(url.query)
+        league = query.get('league', [None])[0]
+        try:
+            info = get_registry().get(league)
+        except ValueError:
+            return self._send(HTTPStatus.NOT_FOUND, b'{"error":"unknown league"}')
+        board = get_leaderboard(league)
+        version = board.refresh()
+        etag = f'"{info["league"]}-s{info["season"]}-{version}"'
+        if self.headers.get('If-None-Match') == etag:
+            return self._send(HTTPStatus.NOT_MODIFIED, etag=etag)
+
+        if url.path == '/rankings':
+            include_guests = query.get('guests', ['1'])[0] not in ('0', 'false')
+            if {'offset', 'limit', 'q'} & set(query):
+                try:
+                    offset = max(0, int(query.get('offset', ['0'])[0]))
+                    limit = min(MAX_PAGE, max(1, int(query.get('limit', ['50'])[0])))
+                except ValueError:
+                    return self._send(HTTPStatus.BAD_REQUEST, b'{"error":"offset and limit should be integers"}')
+                page = api.rankings_page(offset, limit, include_guests, query.get('q', [None])[0], board)
+                return self._send(HTTPStatus.OK, json.dumps(page, ensure_ascii=False).encode(), etag)
+            body = ranking_cache.get(('rankings-json', board.storage.path, include_guests), version,
+                                     lambda: _rankings_json(include_guests, board))
+            return self._send(HTTPStatus.OK, body, etag)
+        if url.path.startswith('/players/'):
+            row = api.player(unquote(url.path[len('/players/'):]), board)
+            if row is None:
+                return self._send(HTTPStatus.NOT_FOUND, b'{"error":"unknown player"}')
+            return self._send(HTTPStatus.OK, json.dumps(row, ensure_ascii=False).encode(), etag)
+        return self._send(HTTPStatus.NOT_FOUND, b'{"error":"not found"}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host='127.0.0.1', port=8502):
+    server = ThreadingHTTPServer((host, port), RankingHandler)
+    print(f'Serving rankings on http://{host}:{port}/rankings')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,232 @@
+from ktp.elo import INITIAL_POINTS
+from ktp.events import MATCH_KINDS
+
+# 경기 기록에서 뽑은 통계. 이벤트를 기록하는 트랜잭션 안에서 같이 갱신하고, 화면은 이 테이블만 읽는다
+#   player_history  플레이어별 경기 결과(W/L/D, 우승은 C), 그 직후 랭킹 포인트와 그때까지의 누적 통계
+#   head_to_head    상대별 전적 (양쪽 방향으로 모두 저장)
+#   partners        복식 파트너별 전적
+#   player_stats    경기 수, 연승(+)/연패(-), 최다 연승, 최근 경기 결과
+# 전적은 경기 순서와 상관없으므로 이벤트를 넣고 뺄 때 더하고 빼기만 한다.
+# 연승과 랭킹 포인트는 순서가 중요해서, 과거 날짜 기록이나 삭제가 있으면 그 지점부터 다시 계산한다.
+# 기록마다 누적 통계를 같이 두므로 다시 계산할 때도 그 지점 직전 행만 읽으면 된다
+STATS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS player_history (
+    player TEXT NOT NULL,
+    played_at TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    ranking_points INTEGER NOT NULL,
+    matches INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    losses INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    streak INTEGER NOT NULL,
+    best_streak INTEGER NOT NULL,
+    PRIMARY KEY (player, played_at, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_player_history_order ON player_history (played_at, seq);
+CREATE TABLE IF NOT EXISTS head_to_head (
+    player TEXT NOT NULL,
+    opponent TEXT NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player, opponent)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS partners (
+    player TEXT NOT NULL,
+    partner TEXT NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player, partner)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS player_stats (
+    player TEXT PRIMARY KEY,
+    matches INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    streak INTEGER NOT NULL DEFAULT 0,
+    best_streak INTEGER NOT NULL DEFAULT 0,
+    form TEXT NOT NULL DEFAULT '',
+    last_played TEXT
+);
+"""
+
+STATS_COLUMNS = {
+    'Player': 'player',
+    'Matches': 'matches',
+    'Wins': 'wins',
+    'Losses': 'losses',
+    'Draws': 'draws',
+    'Streak': 'streak',
+    'Best Streak': 'best_streak',
+    'Form': 'form',
+    'Last Played': 'last_played',
+}
+
+# 최근 경기 결과로 보여줄 개수
+FORM_LENGTH = 10
+
+
+def new_stats():
+    return {'Matches': 0, 'Wins': 0, 'Losses': 0, 'Draws': 0, 'Streak': 0, 'Best Streak': 0,
+            'Form': '', 'Last Played': None}
+
+
+# 경기 결과 하나를 통계에 더한다. 우승(C)은 경기 수에 넣지 않는다
+def fold_result(stats, result, played_at):
+    if result == 'C':
+        return stats
+    stats['Matches'] += 1
+    if result == 'W':
+        stats['Wins'] += 1
+        stats['Streak'] = stats['Streak'] + 1 if stats['Streak'] > 0 else 1
+        stats['Best Streak'] = max(stats['Best Streak'], stats['Streak'])
+    elif result == 'L':
+        stats['Losses'] += 1
+        stats['Streak'] = stats['Streak'] - 1 if stats['Streak'] < 0 else -1
+    else:
+        stats['Draws'] += 1
+        stats['Streak'] = 0
+    stats['Form'] = (stats['Form'] + result)[-FORM_LENGTH:]
+    stats['Last Played'] = played_at
+    return stats
+
+
+# 경기 하나의 (플레이어, 결과) 목록
+def match_results(kind, players):
+    half = len(players) // 2
+    if kind == 'draw':
+        return [(p, 'D') for p in players]
+    return [(p, 'W') for p in players[:half]] + [(p, 'L') for p in players[half:]]
+
+
+_CUMULATIVE = ['Matches', 'Wins', 'Losses', 'Draws', 'Streak', 'Best Streak']
+
+
+# 이벤트들을 모았다가 한 번에 쓴다.
+#   ratings: 플레이어별 현재 랭킹 포인트. 무승부처럼 점수가 안 바뀌는 경기의 기록에 쓴다
+class StatsRecorder:
+    def __init__(self, ratings=None):
+        self.ratings = dict(ratings or {})
+        self.history = {}
+        self.pairs = {}
+
+    # 이벤트 하나를 기록한다. after 는 players 순서대로의 경기 직후 랭킹 포인트 (없으면 그대로).
+    # 새로 추가된 플레이어는 초기 점수에서 시작한다
+    def event(self, played_at, seq, kind, players, after=None):
+        if kind == 'add':
+            self.ratings[players[0]] = INITIAL_POINTS
+            return
+        if kind not in MATCH_KINDS and kind != 'championship':
+            return
+        if after is not None:
+            self.ratings.update(zip(players, after))
+        results = match_results(kind, players) if kind in MATCH_KINDS else [(players[0], 'C')]
+        for player, result in results:
+            self.history.setdefault(player, []).append((played_at, seq, result, int(self.ratings[player])))
+
+    # 전적 증감. 이벤트를 넣을 때 sign=1, 지울 때 sign=-1
+    def pairs_of(self, kind, players, sign=1):
+        if kind not in MATCH_KINDS:
+            return
+        half = len(players) // 2
+        sides = [players[:half], players[half:]]
+        draw = kind == 'draw'
+        for side, other, won in ((sides[0], sides[1], True), (sides[1], sides[0], False)):
+            column = 2 if draw else (0 if won else 1)
+            for player in side:
+                for opponent in other:
+                    self._add('head_to_head', player, opponent, column, sign)
+                for partner in side:
+                    if partner != player:
+                        self._add('partners', player, partner, column, sign)
+
+    def _add(self, table, player, other, column, sign):
+        counts = self.pairs.setdefault((table, player, other), [0, 0, 0])
+        counts[column] += sign
+
+    # 모은 기록을 쓴다. 각 플레이어의 첫 기록 직전 행에서 누적 통계를 이어 받는다.
+    # touched 는 기록이 지워지기만 한 플레이어로, 남은 마지막 행으로 통계를 맞춘다
+    def flush(self, conn, touched=()):
+        rows = []
+        stats = {}
+        for player, records in self.history.items():
+            current = stats_before(conn, player, records[0][:2])
+            for played_at, seq, result, rp in records:
+                fold_result(current, result, played_at)
+                rows.append((player, played_at, seq, result, rp, *(current[c] for c in _CUMULATIVE)))
+            stats[player] = current
+        for player in touched:
+            if player not in stats:
+                stats[player] = stats_before(conn, player)
+        conn.executemany(
+            'INSERT OR REPLACE INTO player_history (player, played_at, seq, result, ranking_points, '
+            'matches, wins, losses, draws, streak, best_streak) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        for table, column in (('head_to_head', 'opponent'), ('partners', 'partner')):
+            conn.executemany(
+                f'INSERT INTO {table} (player, {column}, wins, losses, draws) VALUES (?, ?, ?, ?, ?) '
+                f'ON CONFLICT(player, {column}) DO UPDATE SET wins = wins + excluded.wins, '
+                'losses = losses + excluded.losses, draws = draws + excluded.draws',
+                [(a, b, *counts) for (t, a, b), counts in self.pairs.items() if t == table],
+            )
+        write_player_stats(conn, stats)
+        self.history, self.pairs = {}, {}
+
+
+# position 직전까지(없으면 전체)의 누적 통계. 최근 경기 결과는 그 앞의 경기 FORM_LENGTH 개로 만든다
+def stats_before(conn, player, position=None):
+    stats = new_stats()
+    where, params = 'player = ?', (player,)
+    if position is not None:
+        where, params = 'player = ? AND (played_at, seq) < (?, ?)', (player, *position)
+    row = conn.execute(
+        f'SELECT matches, wins, losses, draws, streak, best_streak FROM player_history '
+        f'WHERE {where} ORDER BY played_at DESC, seq DESC LIMIT 1', params,
+    ).fetchone()
+    if row is None:
+        return stats
+    stats.update(zip(_CUMULATIVE, tuple(row)))
+    recent = conn.execute(
+        f"SELECT result, played_at FROM player_history WHERE {where} AND result != 'C' "
+        'ORDER BY played_at DESC, seq DESC LIMIT ?', (*params, FORM_LENGTH),
+    ).fetchall()
+    stats['Form'] = ''.join(r['result'] for r in reversed(recent))
+    stats['Last Played'] = recent[0]['played_at'] if recent else None
+    return stats
+
+
+def load_player_stats(conn, players):
+    stats = {}
+    for start in range(0, len(players), 500):
+        chunk = players[start:start + 500]
+        rows = conn.execute(
+            f'SELECT {", ".join(STATS_COLUMNS.values())} FROM player_stats '
+            f'WHERE player IN ({", ".join("?" * len(chunk))})', chunk)
+        for row in rows:
+            record = dict(zip(STATS_COLUMNS, tuple(row)))
+            stats[record.pop('Player')] = record
+    return stats
+
+
+def write_player_stats(conn, stats):
+    columns = list(STATS_COLUMNS.values())
+    conn.executemany(
+        f'INSERT OR REPLACE INTO player_stats ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+        [(player, *(row[c] for c in list(STATS_COLUMNS)[1:])) for player, row in stats.items()],
+    )
+
+
+# position 이후(포함)의 경기 기록을 지우고, 영향을 받은 플레이어 목록을 돌려준다
+def truncate_history(conn, position):
+    players = [row[0] for row in conn.execute(
+        'SELECT DISTINCT player FROM player_history WHERE (played_at, seq) >= (?, ?)', position)]
+    conn.execute('DELETE FROM player_history WHERE (played_at, seq) >= (?, ?)', position)
+    return players
+
+
+def clear_stats(conn):
+    for table in ('player_history', 'head_to_head', 'partners', 'player_stats'):
+        conn.execute(f'DELETE FROM {table}')
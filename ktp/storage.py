@@ -0,0 +1,923 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from ktp.events import (
+    DELETABLE_KINDS, MATCH_KINDS, SNAPSHOT_INTERVAL, apply_event, apply_matches_batch, dump_state, load_state, match_timestamp,
+    validate_event,
+)
+from ktp.metrics import timed
+from ktp.stats import STATS_SCHEMA, StatsRecorder, clear_stats, load_player_stats, truncate_history
+
+# 데이터프레임 컬럼 이름 <-> DB 컬럼 이름
+PLAYER_COLUMNS = {
+    'Player': 'player',
+    'Ranking Points': 'ranking_points',
+    'Wins': 'wins',
+    'Losses': 'losses',
+    'Draws': 'draws',
+    'Championships': 'championships',
+    'Guest': 'guest',
+}
+EVENT_COLUMNS = {
+    'Seq': 'seq',
+    'Played At': 'played_at',
+    'Kind': 'kind',
+    'Players': 'players',
+    'Value': 'value',
+}
+SCREENSHOT_COLUMNS = {
+    'ID': 'id',
+    'Filename': 'filename',
+    'Thumbnail': 'thumbnail',
+    'Uploaded At': 'uploaded_at',
+    'Size': 'size',
+    'SHA256': 'sha256',
+    'Width': 'width',
+    'Height': 'height',
+}
+USER_COLUMNS = {
+    'UserID': 'userid',
+    'Password': 'password',
+    'Username': 'username',
+    'Role': 'role',
+    'Approved': 'approved',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    player TEXT PRIMARY KEY,
+    ranking_points INTEGER NOT NULL DEFAULT 1000,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    championships INTEGER NOT NULL DEFAULT 0,
+    guest INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_players_ranking ON players (guest, ranking_points DESC);
+CREATE TABLE IF NOT EXISTS users (
+    userid TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    username TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'guest',
+    approved INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+-- 경기 기록은 추가만 한다. 삭제는 deleted 표시 후 그 지점부터 다시 계산한다
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    played_at TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    players TEXT NOT NULL,
+    value INTEGER NOT NULL DEFAULT 0,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_events_order ON events (played_at, seq);
+-- 플레이어가 추가된 시점 찾기 (과거 날짜 기록 확인)
+CREATE INDEX IF NOT EXISTS idx_events_add ON events (players) WHERE kind = 'add';
+-- seq 0 스냅샷은 이벤트 기록 이전의 기준 상태
+CREATE TABLE IF NOT EXISTS snapshots (
+    seq INTEGER PRIMARY KEY,
+    played_at TEXT NOT NULL,
+    state TEXT NOT NULL
+);
+-- 업로드한 스크린샷 목록. 파일은 screenshots 폴더에 있고 여기에는 메타데이터만 둔다
+CREATE TABLE IF NOT EXISTS screenshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL UNIQUE,
+    thumbnail TEXT,
+    uploaded_at TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL UNIQUE,
+    width INTEGER,
+    height INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_screenshots_uploaded ON screenshots (uploaded_at, id);
+-- 리그와 시즌 목록 (ktp/leagues.py). 기본 저장소에만 채운다. 시즌 하나가 DB 파일 하나(path)이고,
+-- 끝난 시즌은 ended_at 과 최종 순위(standings, JSON)를 기록해 둔다
+CREATE TABLE IF NOT EXISTS leagues (
+    league TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    season INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seasons (
+    league TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    ended_at TEXT,
+    standings TEXT,
+    PRIMARY KEY (league, season)
+);
+"""
+
+
+# 낙관적 잠금 재시도를 다 써도 다른 쓰기와 계속 충돌할 때
+class ConcurrentUpdateError(RuntimeError):
+    pass
+
+
+# 임시 파일에 쓴 뒤 rename 해서, 쓰다가 죽어도 기존 파일이 깨지지 않게 한다
+def atomic_to_excel(df, filename):
+    fd, tmp = tempfile.mkstemp(suffix='.xlsx', dir=os.path.dirname(os.path.abspath(filename)))
+    os.close(fd)
+    try:
+        df.to_excel(tmp, index=False)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def empty_players():
+    return pd.DataFrame(columns=list(PLAYER_COLUMNS))
+
+
+def empty_users():
+    return pd.DataFrame(columns=list(USER_COLUMNS))
+
+
+# 저장소 인터페이스: 새 백엔드는 이 클래스를 상속해서 BACKENDS 에 등록한다.
+# 랭킹, 캐시, 스크린샷, 리그 목록은 여기 있는 메서드와 path 만 쓴다
+class Storage:
+    # 저장소 위치. 랭킹과 캐시에서 저장소를 구별하는 키이고, 리그 파티션 경로의 기준이다
+    path = None
+
+    # 설정/버전 등 키-값
+    def get_meta(self, key, default=None):
+        raise NotImplementedError
+
+    def set_meta(self, key, value):
+        raise NotImplementedError
+
+    def load_players(self):
+        raise NotImplementedError
+
+    # 플레이어 데이터가 바뀔 때마다 증가하는 값. 캐시 키로 쓴다
+    def data_version(self):
+        raise NotImplementedError
+
+    # (버전, since 버전 이후에 바뀐 플레이어 행, 삭제된 플레이어가 있었는지). since=-1 이면 전체.
+    # 각 행에는 추가 순서 Order 가 들어 있다
+    def load_changes(self, since):
+        raise NotImplementedError
+
+    def get_player(self, name):
+        raise NotImplementedError
+
+    def upsert_players(self, df):
+        raise NotImplementedError
+
+    def load_users(self):
+        raise NotImplementedError
+
+    # 사용자 데이터가 바뀔 때마다 증가하는 값
+    def users_version(self):
+        raise NotImplementedError
+
+    def upsert_users(self, df):
+        raise NotImplementedError
+
+    def add_user(self, user):
+        raise NotImplementedError
+
+    def update_user(self, userid, mutate, retries=10):
+        raise NotImplementedError
+
+    def delete_user(self, userid):
+        raise NotImplementedError
+
+    def append_event(self, kind, players, value=0, played_at=None):
+        raise NotImplementedError
+
+    def append_events(self, events):
+        raise NotImplementedError
+
+    def delete_event(self, seq):
+        raise NotImplementedError
+
+    def load_events(self, limit=None):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def checkpoint(self):
+        raise NotImplementedError
+
+    # 스크린샷 메타데이터 추가. 같은 내용(sha256)이 이미 있으면 기존 행을 돌려준다
+    def add_screenshot(self, record):
+        raise NotImplementedError
+
+    def find_screenshot(self, sha256):
+        raise NotImplementedError
+
+    # 최근 업로드 순
+    def load_screenshots(self, limit=None, offset=0):
+        raise NotImplementedError
+
+    def count_screenshots(self):
+        raise NotImplementedError
+
+    # 리그 목록 (ktp/leagues.py). 리그마다 league, title, 현재 season, 그 시즌의 path
+    def load_leagues(self):
+        raise NotImplementedError
+
+    # 리그 목록이 바뀔 때마다 증가하는 값
+    def leagues_version(self):
+        raise NotImplementedError
+
+    # 리그를 path 에 있는 첫 시즌과 함께 추가. 이미 있으면 False
+    def add_league(self, league, title, path):
+        raise NotImplementedError
+
+    # 리그의 현재 시즌 season 을 최종 순위와 함께 끝내고 path 에서 다음 시즌을 시작한다
+    def start_season(self, league, season, path, standings):
+        raise NotImplementedError
+
+    def load_seasons(self, league):
+        raise NotImplementedError
+
+    # 끝난 시즌의 최종 순위. 없으면 None
+    def load_standings(self, league, season):
+        raise NotImplementedError
+
+    # 경기 기록 통계 (ktp/stats.py)
+    def get_player_stats(self, name):
+        raise NotImplementedError
+
+    def load_head_to_head(self, name):
+        raise NotImplementedError
+
+    def load_partners(self, name):
+        raise NotImplementedError
+
+    def load_rating_history(self, name):
+        raise NotImplementedError
+
+    def rebuild_stats(self):
+        raise NotImplementedError
+
+    # 기존 엑셀 파일을 한 번에 가져오기
+    @timed('storage.import_excel')
+    def import_excel(self, players_file='league_of_ktp.xlsx', users_file='users.xlsx'):
+        if players_file and os.path.exists(players_file):
+            players = pd.read_excel(players_file)
+            if 'Guest' not in players.columns:
+                players['Guest'] = False
+            self.upsert_players(players)
+        if users_file and os.path.exists(users_file):
+            self.upsert_users(pd.read_excel(users_file))
+
+    # 현재 데이터를 엑셀 파일로 내보내기
+    @timed('storage.export_excel')
+    def export_excel(self, players_file='league_of_ktp.xlsx', users_file='users.xlsx'):
+        if players_file:
+            atomic_to_excel(self.load_players(), players_file)
+        if users_file:
+            atomic_to_excel(self.load_users(), users_file)
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path='ktp.db'):
+        self.path = path
+        self._local = threading.local()
+        conn = self.connect()
+        conn.executescript(SCHEMA)
+        conn.executescript(STATS_SCHEMA)
+        with self.transaction() as conn:
+            # version 컬럼이 없던 예전 DB
+            for table in ('players', 'users'):
+                if 'version' not in [row['name'] for row in conn.execute(f'PRAGMA table_info({table})')]:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_players_version ON players (version)')
+            if conn.execute('SELECT 1 FROM snapshots WHERE seq = 0').fetchone() is None:
+                conn.execute(
+                    "INSERT INTO snapshots (seq, played_at, state) VALUES (0, '', ?)",
+                    (dump_state(self._read_state(conn)),),
+                )
+        # 통계 테이블이 생기기 전의 경기 기록
+        if self.get_meta('stats_built') is None:
+            self.rebuild_stats()
+
+    # 스트림릿은 세션마다 다른 스레드에서 실행되므로 연결은 스레드별로 둔다
+    def connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connect()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def get_meta(self, key, default=None):
+        row = self.connect().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_meta(self, key, value):
+        with self.transaction() as conn:
+            conn.execute(
+                'INSERT INTO meta (key, value) VALUES (?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                (key, str(value)),
+            )
+
+    def data_version(self):
+        return int(self.get_meta('players_version', 0))
+
+    def users_version(self):
+        return int(self.get_meta('users_version', 0))
+
+    def _bump_version(self, conn, key='players_version'):
+        conn.execute(
+            'INSERT INTO meta (key, value) VALUES (?, 1) '
+            'ON CONFLICT(key) DO UPDATE SET value = value + 1',
+            (key,),
+        )
+        return int(conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()[0])
+
+    # since 버전 이후에 바뀐 플레이어 행. 삭제된 플레이어가 있으면 removed 가 True
+    @timed('storage.load_changes')
+    def load_changes(self, since):
+        conn = self.connect()
+        conn.execute('BEGIN')
+        try:
+            rows = conn.execute(
+                f'SELECT rowid, {", ".join(PLAYER_COLUMNS.values())} FROM players WHERE version > ? ORDER BY rowid',
+                (since,),
+            ).fetchall()
+            version = self.data_version()
+            removed = int(self.get_meta('roster_version', 0)) > since
+        finally:
+            conn.execute('COMMIT')
+        changes = {}
+        for row in rows:
+            record = dict(zip(PLAYER_COLUMNS, tuple(row)[1:]))
+            record['Guest'] = bool(record['Guest'])
+            record['Order'] = row['rowid']
+            changes[record.pop('Player')] = record
+        return version, changes, removed
+
+    def _load(self, table, columns, order_by):
+        sql = f'SELECT {", ".join(columns.values())} FROM {table} ORDER BY {order_by}'
+        rows = self.connect().execute(sql).fetchall()
+        df = pd.DataFrame([tuple(row) for row in rows], columns=list(columns))
+        return df
+
+    def _upsert(self, table, columns, key, df):
+        cols = list(columns.values())
+        updates = ', '.join(f'{c} = excluded.{c}' for c in cols if c != key)
+        sql = (
+            f'INSERT INTO {table} ({", ".join(cols)}) VALUES ({", ".join("?" * len(cols))}) '
+            f'ON CONFLICT({key}) DO UPDATE SET {updates}'
+        )
+        rows = [
+            tuple(_to_sql(record[name]) for name in columns)
+            for record in df[list(columns)].to_dict('records')
+        ]
+        with self.transaction() as conn:
+            conn.executemany(sql, rows)
+
+    @timed('storage.load_players')
+    def load_players(self):
+        df = self._load('players', PLAYER_COLUMNS, 'rowid')
+        df['Guest'] = df['Guest'].astype(bool)
+        return df
+
+    def get_player(self, name):
+        row = self.connect().execute(
+            f'SELECT {", ".join(PLAYER_COLUMNS.values())} FROM players WHERE player = ?', (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        player = dict(zip(PLAYER_COLUMNS, tuple(row)))
+        player['Guest'] = bool(player['Guest'])
+        return player
+
+    # 경기 기록이 없을 때만 플레이어 표를 그대로 넣는다. 넣은 상태가 재계산의 기준 스냅샷이 된다.
+    # 기록이 있으면 과거 경기를 다시 계산할 때 사라지므로 받지 않는다
+    def upsert_players(self, df):
+        state = {}
+        for record in df[list(PLAYER_COLUMNS)].to_dict('records'):
+            state[record.pop('Player')] = record
+        with self.transaction() as conn:
+            if self._last_position(conn) != ('', 0):
+                raise ValueError('Players can only be imported before any events are recorded.')
+            self._write_state(conn, state, list(state))
+            self._save_snapshot(conn, ('', 0), self._read_state(conn))
+
+    @timed('storage.load_users')
+    def load_users(self):
+        df = self._load('users', USER_COLUMNS, 'rowid')
+        df['Approved'] = df['Approved'].astype(bool)
+        return df
+
+    def upsert_users(self, df):
+        with self.transaction() as conn:
+            self._upsert('users', USER_COLUMNS, 'userid', df)
+            conn.executemany(
+                'UPDATE users SET version = version + 1 WHERE userid = ?',
+                [(userid,) for userid in df['UserID']],
+            )
+            self._bump_version(conn, 'users_version')
+
+    # 새 사용자 추가. 같은 UserID 가 이미 있으면 False
+    def add_user(self, user):
+        try:
+            with self.transaction() as conn:
+                conn.execute(
+                    f'INSERT INTO users ({", ".join(USER_COLUMNS.values())}) VALUES ({", ".join("?" * len(USER_COLUMNS))})',
+                    tuple(_to_sql(user[name]) for name in USER_COLUMNS),
+                )
+                self._bump_version(conn, 'users_version')
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    # 낙관적 잠금으로 사용자 한 명을 수정한다. 읽은 뒤 다른 관리자가 먼저 고쳤으면
+    # 다시 읽어서 mutate 를 재적용한다. 사용자가 없으면 None
+    def update_user(self, userid, mutate, retries=10):
+        conn = self.connect()
+        columns = list(USER_COLUMNS.values())
+        for _ in range(retries):
+            row = conn.execute(
+                f'SELECT {", ".join(columns)}, version FROM users WHERE userid = ?', (userid,)
+            ).fetchone()
+            if row is None:
+                return None
+            user = dict(zip(USER_COLUMNS, tuple(row)))
+            user['Approved'] = bool(user['Approved'])
+            updated = mutate(dict(user))
+            with self.transaction() as conn:
+                cursor = conn.execute(
+                    f'UPDATE users SET {", ".join(f"{c} = ?" for c in columns[1:])}, version = version + 1 '
+                    'WHERE userid = ? AND version = ?',
+                    tuple(_to_sql(updated[name]) for name in list(USER_COLUMNS)[1:]) + (userid, row['version']),
+                )
+                if cursor.rowcount == 1:
+                    self._bump_version(conn, 'users_version')
+            if cursor.rowcount == 1:
+                return updated
+        raise ConcurrentUpdateError(f'User {userid} is being updated by someone else.')
+
+    def delete_user(self, userid):
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM users WHERE userid = ?', (userid,))
+            self._bump_version(conn, 'users_version')
+
+    # players 테이블(현재 랭킹)을 상태 dict 로 읽기
+    def _read_state(self, conn, players=None):
+        sql = f'SELECT {", ".join(PLAYER_COLUMNS.values())} FROM players'
+        params = ()
+        if players is not None:
+            sql += f' WHERE player IN ({", ".join("?" * len(players))})'
+            params = tuple(players)
+        state = {}
+        for row in conn.execute(sql, params):
+            record = dict(zip(PLAYER_COLUMNS, tuple(row)))
+            record['Guest'] = bool(record['Guest'])
+            state[record.pop('Player')] = record
+        return state
+
+    # 상태 dict 를 players 테이블에 반영. players 가 주어지면 해당 행만 비교한다.
+    # 실제로 바뀐 행만 쓰고, 그 행에는 새 데이터 버전을 기록한다
+    def _write_state(self, conn, state, players=None):
+        current = self._read_state(conn, players)
+        names = list(state) if players is None else list(players)
+        removed = [name for name in current if name not in state]
+        changed = [name for name in names if name in state and state[name] != current.get(name)]
+        if not removed and not changed:
+            return
+        version = self._bump_version(conn)
+        if removed:
+            conn.executemany('DELETE FROM players WHERE player = ?', [(name,) for name in removed])
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('roster_version', ?) "
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                (version,),
+            )
+        cols = list(PLAYER_COLUMNS.values()) + ['version']
+        updates = ', '.join(f'{c} = excluded.{c}' for c in cols[1:])
+        conn.executemany(
+            f'INSERT INTO players ({", ".join(cols)}) VALUES ({", ".join("?" * len(cols))}) '
+            f'ON CONFLICT(player) DO UPDATE SET {updates}',
+            [
+                (name,) + tuple(_to_sql(state[name][c]) for c in list(PLAYER_COLUMNS)[1:]) + (version,)
+                for name in changed
+            ],
+        )
+
+    def _last_position(self, conn):
+        row = conn.execute(
+            'SELECT played_at, seq FROM events WHERE deleted = 0 ORDER BY played_at DESC, seq DESC LIMIT 1'
+        ).fetchone()
+        return (row['played_at'], row['seq']) if row else ('', 0)
+
+    def _save_snapshot(self, conn, position, state):
+        conn.execute(
+            'INSERT OR REPLACE INTO snapshots (seq, played_at, state) VALUES (?, ?, ?)',
+            (position[1], position[0], dump_state(state)),
+        )
+
+    # 마지막 스냅샷 이후에 쌓인 이벤트 수
+    def _pending_events(self, conn):
+        last = conn.execute('SELECT played_at, seq FROM snapshots ORDER BY played_at DESC, seq DESC LIMIT 1').fetchone()
+        return conn.execute(
+            'SELECT COUNT(*) FROM events WHERE deleted = 0 AND (played_at, seq) > (?, ?)',
+            (last['played_at'], last['seq']),
+        ).fetchone()[0]
+
+    # 마지막 스냅샷 이후 이벤트가 SNAPSHOT_INTERVAL 개 쌓였으면 새 스냅샷 저장
+    def _maybe_checkpoint(self, conn, position):
+        if self._pending_events(conn) >= SNAPSHOT_INTERVAL:
+            self._save_snapshot(conn, position, self._read_state(conn))
+
+    # 과거 날짜로 기록하는 (위치, kind, players) 이벤트들의 플레이어가 그 시점에 이미 추가돼 있는지 확인한다.
+    # 다시 계산하다가 실패하기 전에 언제 추가됐는지 알려 준다
+    def _check_joined(self, conn, events):
+        names = sorted({player for _, kind, players in events if kind != 'add' for player in players})
+        joined = {}
+        for i in range(0, len(names), 500):
+            keys = [json.dumps([name], ensure_ascii=False) for name in names[i:i + 500]]
+            rows = conn.execute(
+                "SELECT played_at, seq, players FROM events WHERE kind = 'add' AND deleted = 0 "
+                f'AND players IN ({", ".join("?" * len(keys))})', keys)
+            for row in rows:
+                name = json.loads(row['players'])[0]
+                joined[name] = max(joined.get(name, ('', 0)), (row['played_at'], row['seq']))
+        for position, kind, players in events:
+            for player in players:
+                if kind != 'add' and player in joined and joined[player] > position:
+                    raise ValueError(f'{player} was added on {joined[player][0][:10]}, '
+                                     f'so a {kind} on {position[0][:10]} cannot include them.')
+
+    # position 이후(포함)의 이벤트만 직전 스냅샷에서부터 다시 적용. 경기 기록 통계도 그 지점부터 다시 만든다.
+    # 그 시점에 없는 플레이어가 나오는 이벤트(추가 전 날짜의 경기 등)가 있으면 ValueError 로 전체를 되돌린다
+    @timed('storage.replay')
+    def _replay(self, conn, position, recorder=None):
+        recorder = recorder or StatsRecorder()
+        touched = truncate_history(conn, position)
+        conn.execute(
+            'DELETE FROM snapshots WHERE seq != 0 AND (played_at, seq) >= (?, ?)', position)
+        snapshot = conn.execute(
+            'SELECT played_at, seq, state FROM snapshots ORDER BY played_at DESC, seq DESC LIMIT 1'
+        ).fetchone()
+        state = load_state(snapshot['state'])
+        events = conn.execute(
+            'SELECT played_at, seq, kind, players, value FROM events '
+            'WHERE deleted = 0 AND (played_at, seq) > (?, ?) ORDER BY played_at, seq',
+            (snapshot['played_at'], snapshot['seq']),
+        )
+        for count, event in enumerate(events.fetchall(), start=1):
+            kind, players = event['kind'], json.loads(event['players'])
+            try:
+                validate_event(state, kind, players)
+            except ValueError as e:
+                raise ValueError(f"Event {event['seq']} ({kind}) cannot be replayed: {e}") from None
+            apply_event(state, kind, players, event['value'])
+            recorder.event(event['played_at'], event['seq'], kind, players, _ratings_after(state, kind, players))
+            if count % SNAPSHOT_INTERVAL == 0:
+                self._save_snapshot(conn, (event['played_at'], event['seq']), state)
+        self._write_state(conn, state)
+        recorder.flush(conn, touched)
+
+    # 경기 결과 등 이벤트를 기록하고 랭킹을 증분 갱신한다. 새 이벤트의 seq 를 돌려준다
+    @timed('storage.append_event')
+    def append_event(self, kind, players, value=0, played_at=None):
+        players = list(players)
+        played_at = played_at or match_timestamp()
+        with self.transaction() as conn:
+            state = self._read_state(conn, players)
+            validate_event(state, kind, players)
+            seq = conn.execute(
+                'INSERT INTO events (played_at, kind, players, value) VALUES (?, ?, ?, ?)',
+                (played_at, kind, json.dumps(players, ensure_ascii=False), int(value)),
+            ).lastrowid
+            recorder = StatsRecorder()
+            recorder.pairs_of(kind, players)
+            if self._last_position(conn) != (played_at, seq):
+                # 과거 날짜로 기록된 경기: 그 시점부터 다시 계산
+                self._check_joined(conn, [((played_at, seq), kind, players)])
+                self._replay(conn, (played_at, seq), recorder)
+            else:
+                apply_event(state, kind, players, value)
+                self._write_state(conn, state, players)
+                recorder.event(played_at, seq, kind, players, _ratings_after(state, kind, players))
+                recorder.flush(conn)
+                self._maybe_checkpoint(conn, (played_at, seq))
+        return seq
+
+    # (kind, players, value, played_at) 목록을 한 트랜잭션으로 기록한다.
+    # 모두 마지막 기록 이후라면 바로 적용하고, 아니면 가장 이른 지점부터 다시 계산한다.
+    # 바로 적용할 때도 SNAPSHOT_INTERVAL 개마다 스냅샷을 남겨서, 나중에 이 범위 안의 과거 날짜 기록이나
+    # 삭제가 있어도 그 근처에서부터 다시 계산하게 한다
+    @timed('storage.append_events')
+    def append_events(self, events):
+        events = [
+            (kind, list(players), int(value), played_at or match_timestamp())
+            for kind, players, value, played_at in events
+        ]
+        with self.transaction() as conn:
+            state = self._read_state(conn)
+            roster = set(state)
+            for kind, players, _, _ in events:
+                validate_event(roster, kind, players)
+                if kind == 'add':
+                    roster.add(players[0])
+                elif kind == 'remove':
+                    roster.discard(players[0])
+
+            last = self._last_position(conn)
+            pending = self._pending_events(conn)
+            positions = []
+            for kind, players, value, played_at in events:
+                seq = conn.execute(
+                    'INSERT INTO events (played_at, kind, players, value) VALUES (?, ?, ?, ?)',
+                    (played_at, kind, json.dumps(players, ensure_ascii=False), value),
+                ).lastrowid
+                positions.append((played_at, seq))
+            if not positions:
+                return []
+
+            recorder = StatsRecorder({name: row['Ranking Points'] for name, row in state.items()})
+            for kind, players, _, _ in events:
+                recorder.pairs_of(kind, players)
+            if all(a < b for a, b in zip([last] + positions, positions)):
+                # 연속된 경기들은 묶어서 batch_elo 로, 나머지 이벤트는 하나씩 적용
+                changed = set()
+                matches = []
+
+                def apply_batch():
+                    batch_changed, after = apply_matches_batch(state, [m[2:] for m in matches], history=True)
+                    changed.update(batch_changed)
+                    for (played_at, seq, kind, players), rps in zip(matches, after):
+                        recorder.event(played_at, seq, kind, players, rps)
+                    matches.clear()
+
+                for (kind, players, value, _), (played_at, seq) in zip(events, positions):
+                    if kind in MATCH_KINDS:
+                        matches.append((played_at, seq, kind, players))
+                    else:
+                        if matches:
+                            apply_batch()
+                        changed.update(apply_event(state, kind, players, value))
+                        recorder.event(played_at, seq, kind, players, _ratings_after(state, kind, players))
+                    pending += 1
+                    if pending >= SNAPSHOT_INTERVAL:
+                        if matches:
+                            apply_batch()
+                        self._save_snapshot(conn, (played_at, seq), state)
+                        pending = 0
+                if matches:
+                    apply_batch()
+                self._write_state(conn, state, changed)
+                recorder.flush(conn)
+            else:
+                self._check_joined(conn, [(position, kind, players)
+                                          for (kind, players, _, _), position in zip(events, positions)])
+                self._replay(conn, min(positions), recorder)
+        return [seq for _, seq in positions]
+
+    @timed('storage.delete_event')
+    def delete_event(self, seq):
+        with self.transaction() as conn:
+            event = conn.execute(
+                'SELECT played_at, seq, kind, players FROM events WHERE seq = ? AND deleted = 0', (int(seq),)
+            ).fetchone()
+            if event is None:
+                raise ValueError(f'Unknown event: {seq}')
+            if event['kind'] not in DELETABLE_KINDS:
+                raise ValueError(f"Only match results and championships can be deleted (event {seq} is {event['kind']}).")
+            conn.execute('UPDATE events SET deleted = 1 WHERE seq = ?', (int(seq),))
+            recorder = StatsRecorder()
+            recorder.pairs_of(event['kind'], json.loads(event['players']), -1)
+            self._replay(conn, (event['played_at'], event['seq']), recorder)
+
+    @timed('storage.load_events')
+    def load_events(self, limit=None):
+        sql = (
+            f'SELECT {", ".join(EVENT_COLUMNS.values())} FROM events WHERE deleted = 0 '
+            'ORDER BY played_at DESC, seq DESC'
+        )
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        rows = self.connect().execute(sql).fetchall()
+        df = pd.DataFrame([tuple(row) for row in rows], columns=list(EVENT_COLUMNS))
+        df['Players'] = df['Players'].map(json.loads)
+        return df
+
+    # 기준 스냅샷부터 모든 이벤트를 다시 적용
+    def rebuild(self):
+        with self.transaction() as conn:
+            self._replay(conn, ('', 1))
+
+    # 현재 상태를 마지막 이벤트 위치의 스냅샷으로 저장
+    def checkpoint(self):
+        with self.transaction() as conn:
+            self._save_snapshot(conn, self._last_position(conn), self._read_state(conn))
+
+    # 통계 테이블을 경기 기록 전체에서 다시 만든다
+    @timed('storage.rebuild_stats')
+    def rebuild_stats(self):
+        with self.transaction() as conn:
+            clear_stats(conn)
+            recorder = StatsRecorder()
+            for event in conn.execute('SELECT kind, players FROM events WHERE deleted = 0'):
+                recorder.pairs_of(event['kind'], json.loads(event['players']))
+            self._replay(conn, ('', 1), recorder)
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('stats_built', 1) "
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value')
+
+    @timed('storage.get_player_stats')
+    def get_player_stats(self, name):
+        return load_player_stats(self.connect(), [name]).get(name)
+
+    def _pair_frame(self, table, column, label, name):
+        rows = self.connect().execute(
+            f'SELECT {column}, wins, losses, draws FROM {table} WHERE player = ? '
+            'AND wins + losses + draws > 0 ORDER BY wins + losses + draws DESC, wins DESC', (name,)
+        ).fetchall()
+        return pd.DataFrame([tuple(row) for row in rows], columns=[label, 'Wins', 'Losses', 'Draws'])
+
+    @timed('storage.load_head_to_head')
+    def load_head_to_head(self, name):
+        return self._pair_frame('head_to_head', 'opponent', 'Opponent', name)
+
+    @timed('storage.load_partners')
+    def load_partners(self, name):
+        return self._pair_frame('partners', 'partner', 'Partner', name)
+
+    @timed('storage.load_rating_history')
+    def load_rating_history(self, name):
+        rows = self.connect().execute(
+            'SELECT played_at, result, ranking_points FROM player_history WHERE player = ? ORDER BY played_at, seq',
+            (name,),
+        ).fetchall()
+        return pd.DataFrame([tuple(row) for row in rows], columns=['Played At', 'Result', 'Ranking Points'])
+
+    def _screenshot(self, row):
+        return dict(zip(SCREENSHOT_COLUMNS, tuple(row))) if row is not None else None
+
+    def add_screenshot(self, record):
+        columns = [c for c in SCREENSHOT_COLUMNS if c != 'ID']
+        with self.transaction() as conn:
+            conn.execute(
+                f'INSERT INTO screenshots ({", ".join(SCREENSHOT_COLUMNS[c] for c in columns)}) '
+                f'VALUES ({", ".join("?" * len(columns))}) ON CONFLICT(sha256) DO NOTHING',
+                tuple(_to_sql(record.get(c)) for c in columns),
+            )
+            return self.find_screenshot(record['SHA256'])
+
+    def find_screenshot(self, sha256):
+        return self._screenshot(self.connect().execute(
+            f'SELECT {", ".join(SCREENSHOT_COLUMNS.values())} FROM screenshots WHERE sha256 = ?', (sha256,)
+        ).fetchone())
+
+    def load_screenshots(self, limit=None, offset=0):
+        sql = (
+            f'SELECT {", ".join(SCREENSHOT_COLUMNS.values())} FROM screenshots '
+            'ORDER BY uploaded_at DESC, id DESC'
+        )
+        if limit is not None:
+            sql += f' LIMIT {int(limit)} OFFSET {int(offset)}'
+        return [self._screenshot(row) for row in self.connect().execute(sql)]
+
+    def count_screenshots(self):
+        return self.connect().execute('SELECT COUNT(*) FROM screenshots').fetchone()[0]
+
+    def load_leagues(self):
+        rows = self.connect().execute(
+            'SELECT l.league, l.title, l.season, s.path FROM leagues l '
+            'JOIN seasons s ON s.league = l.league AND s.season = l.season ORDER BY l.created_at, l.league')
+        return [dict(row) for row in rows]
+
+    def leagues_version(self):
+        return int(self.get_meta('leagues_version', 0))
+
+    def add_league(self, league, title, path):
+        now = _now()
+        try:
+            with self.transaction() as conn:
+                conn.execute('INSERT INTO leagues (league, title, season, created_at) VALUES (?, ?, 1, ?)',
+                             (league, title, now))
+                conn.execute('INSERT INTO seasons (league, season, path, started_at) VALUES (?, 1, ?, ?)',
+                             (league, path, now))
+                self._bump_version(conn, 'leagues_version')
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def start_season(self, league, season, path, standings):
+        now = _now()
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE leagues SET season = ? WHERE league = ? AND season = ?', (season + 1, league, season))
+            if cursor.rowcount != 1:
+                raise ValueError(f'Season {season} of {league} was already closed.')
+            conn.execute('UPDATE seasons SET ended_at = ?, standings = ? WHERE league = ? AND season = ?',
+                         (now, json.dumps(standings, ensure_ascii=False, default=str), league, season))
+            conn.execute('INSERT INTO seasons (league, season, path, started_at) VALUES (?, ?, ?, ?)',
+                         (league, season + 1, path, now))
+            self._bump_version(conn, 'leagues_version')
+
+    def load_seasons(self, league):
+        rows = self.connect().execute(
+            'SELECT season, started_at, ended_at FROM seasons WHERE league = ? ORDER BY season', (league,))
+        return [dict(row) for row in rows]
+
+    def load_standings(self, league, season):
+        row = self.connect().execute(
+            'SELECT standings FROM seasons WHERE league = ? AND season = ?', (league, season)).fetchone()
+        if row is None or row['standings'] is None:
+            return None
+        return json.loads(row['standings'])
+
+
+# 통계 기록용 이벤트 직후 랭킹 포인트
+def _ratings_after(state, kind, players):
+    if kind in MATCH_KINDS or kind == 'championship':
+        return [state[p]['Ranking Points'] for p in players]
+    return None
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+# numpy 타입을 sqlite 가 받을 수 있는 파이썬 타입으로 변환
+def _to_sql(value):
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+BACKENDS = {
+    'sqlite': SQLiteStorage,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+# 프로세스 전체에서 공유하는 저장소. 처음 생성할 때 기존 엑셀 데이터를 가져온다
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = BACKENDS[os.environ.get('KTP_STORAGE', 'sqlite')]
+                storage = backend(os.environ.get('KTP_DATABASE', 'ktp.db'))
+                if storage.get_meta('imported_from_excel') is None:
+                    # 이미 경기 기록이 있는 DB 에는 플레이어 표를 덮어쓰지 않는다
+                    players_file = 'league_of_ktp.xlsx' if storage.load_events(limit=1).empty else None
+                    storage.import_excel(players_file)
+                    storage.set_meta('imported_from_excel', 1)
+                _storage = storage
+    return _storage
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='League of KTP 저장소 가져오기/내보내기')
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('--players', default='league_of_ktp.xlsx')
+    parser.add_argument('--users', default='users.xlsx')
+    args = parser.parse_args()
+
+    storage = get_storage()
+    if args.command == 'import':
+        storage.import_excel(args.players, args.users)
+    else:
+        storage.export_excel(args.players, args.users)
@@ -0,0 +1,62 @@
+import threading
+
+import pandas as pd
+
+from ktp.storage import USER_COLUMNS, get_storage
+
+
+# 프로세스 전체에서 공유하는 사용자 목록. UserID 로 바로 찾고, 저장소의 사용자 버전이 바뀌면 다시 읽는다
+class UserStore:
+    def __init__(self, storage):
+        self.storage = storage
+        self.version = None
+        self._users = {}
+        self._frame = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        version = self.storage.users_version()
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    df = self.storage.load_users()
+                    self._users = {user['UserID']: user for user in df.to_dict('records')}
+                    self._frame = df
+                    self.version = version
+        return self.version
+
+    def get(self, userid):
+        self.refresh()
+        user = self._users.get(userid)
+        return dict(user) if user is not None else None
+
+    def __contains__(self, userid):
+        self.refresh()
+        return userid in self._users
+
+    # 관리자 화면용 데이터프레임. 캐시를 같이 쓰므로 수정하면 안 된다
+    def frame(self):
+        self.refresh()
+        return self._frame if self._frame is not None else pd.DataFrame(columns=list(USER_COLUMNS))
+
+    def add(self, user):
+        return self.storage.add_user(user)
+
+    def update(self, userid, mutate):
+        return self.storage.update_user(userid, mutate)
+
+    def delete(self, userid):
+        self.storage.delete_user(userid)
+
+
+_user_store = None
+_user_store_lock = threading.Lock()
+
+
+def get_user_store():
+    global _user_store
+    if _user_store is None:
+        with _user_store_lock:
+            if _user_store is None:
+                _user_store = UserStore(get_storage())
+    return _user_store
@@ -1,42 +1,52 @@
 import streamlit as st
-import pandas as pd
-import hashlib
+from ktp.passwords import TooManyAttempts, get_hasher, get_rate_limiter
+from ktp.storage import ConcurrentUpdateError
+from ktp.users import get_user_store
 
-# 초기 사용자 데이터프레임 생성
-def initialize_users():
-    df = pd.DataFrame(columns=['UserID', 'Password', 'Username', 'Role', 'Approved'])
-    return df
+# 사용자 데이터 불러오기 (프로세스 전체 캐시, 수정 금지)
+def load_users():
+    return get_user_store().frame()
 
-# 엑셀 파일에서 사용자 데이터 불러오기
-def load_users_from_excel(filename='users.xlsx'):
-    try:
-        df = pd.read_excel(filename)
-    except FileNotFoundError:
-        df = initialize_users()
-        df.to_excel(filename, index=False)
-    return df
+# 새 사용자 추가. 이미 있는 UserID 면 False
+def add_user(user):
+    return get_user_store().add(user)
+
+# 사용자 한 명 수정. 동시에 수정되면 다시 읽어서 재시도한다
+def update_user(userid, mutate):
+    return get_user_store().update(userid, mutate)
 
-# 사용자 데이터 엑셀 파일에 저장
-def save_users_to_excel(df, filename='users.xlsx'):
-    df.to_excel(filename, index=False)
+# 사용자 삭제
+def delete_user(userid):
+    get_user_store().delete(userid)
 
-# 비밀번호 해싱 함수
+# 비밀번호 해싱 함수 (솔트를 넣은 scrypt, 인증 스레드 풀에서 계산)
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return get_hasher().hash(password)
+
+# 예전 형식으로 저장된 비밀번호를 새 형식으로 바꾼다. 그 사이 비밀번호가 바뀌었으면 건드리지 않는다
+def rehash_password(userid, stored, password):
+    new_hash = hash_password(password)
+    try:
+        update_user(userid, lambda u: dict(u, Password=new_hash) if u['Password'] == stored else u)
+    except ConcurrentUpdateError:
+        pass  # 다음 로그인 때 다시 시도
 
-# 로그인 기능
-def login(userid, password, df):
-    hashed_password = hash_password(password)
-    user = df[(df['UserID'] == userid) & (df['Password'] == hashed_password) & (df['Approved'] == True)]
-    if not user.empty:
-        return user.iloc[0]
+# 로그인 기능. UserID 로 바로 찾아서 비밀번호를 검증한다. 시도가 너무 많으면 TooManyAttempts
+def login(userid, password):
+    limiter = get_rate_limiter()
+    limiter.hit(userid)
+    user = get_user_store().get(userid)
+    hasher = get_hasher()
+    if user is not None and user['Approved'] and hasher.verify(password, user['Password']):
+        limiter.reset(userid)
+        if hasher.needs_rehash(user['Password']):
+            rehash_password(userid, user['Password'], password)
+        return user
     else:
         return None
 
 # 로그인 페이지
 def login_page():
-    users_df = load_users_from_excel()
-
     hide_streamlit_style = """
         <style>
         #MainMenu {visibility: hidden;}
@@ -51,16 +61,20 @@ def login_page():
     userid = st.text_input('UserID')
     password = st.text_input('Password', type='password')
     if st.button('Login'):
-        user = login(userid, password, users_df)
-        if user is not None:
-            st.session_state.logged_in = True
-            st.session_state.role = user['Role']
-            st.session_state.userid = user['UserID']
-            st.session_state.username = user['Username']
-            st.success('Login successful!')
-            st.experimental_rerun()
+        try:
+            user = login(userid, password)
+        except TooManyAttempts as e:
+            st.error(str(e))
         else:
-            st.error('Invalid userID or password')
+            if user is not None:
+                st.session_state.logged_in = True
+                st.session_state.role = user['Role']
+                st.session_state.userid = user['UserID']
+                st.session_state.username = user['Username']
+                st.success('Login successful!')
+                st.experimental_rerun()
+            else:
+                st.error('Invalid userID or password')
 
     st.markdown("---")
     st.title('Sign Up')
@@ -68,8 +82,6 @@ def login_page():
 
 # 회원가입 페이지
 def signup_page():
-    users_df = load_users_from_excel()
-
     userid = st.text_input('New UserID')
     username = st.text_input('Username')
     password = st.text_input('New Password', type='password')
@@ -77,9 +89,10 @@ def signup_page():
     if st.button('Sign Up'):
         if userid and username and password:
             hashed_password = hash_password(password)
-            new_user = pd.DataFrame([[userid, hashed_password, username, role, False]], columns=['UserID', 'Password', 'Username', 'Role', 'Approved'])
-            users_df = pd.concat([users_df, new_user], ignore_index=True)
-            save_users_to_excel(users_df)
-            st.success('Sign up successful! Waiting for admin approval.')
+            new_user = {'UserID': userid, 'Password': hashed_password, 'Username': username, 'Role': role, 'Approved': False}
+            if add_user(new_user):
+                st.success('Sign up successful! Waiting for admin approval.')
+            else:
+                st.error('UserID already exists.')
         else:
             st.error('Please fill out all fields.')
@@ -1,6 +1,7 @@
 import streamlit as st
-from login import login_page, signup_page
-from tennis_ranking import tennis_ranking_page
+from ktp.metrics import metrics
+
+# 페이지 모듈은 그 페이지를 처음 열 때 불러온다. 저장소, 랭킹 등 데이터는 프로세스에 하나씩 두고 모든 세션이 같이 쓴다
 
 def main():
     if not st.session_state.logged_in:
@@ -13,16 +14,29 @@ def main():
         </style>
         """
         st.markdown(hide_streamlit_style, unsafe_allow_html=True)
+        from login import login_page
         login_page()
     else:
+        from ktp.leagues import get_registry
         st.sidebar.title("Navigation")
+        # 리그가 여러 개면 볼 리그를 고른다. 페이지는 고른 리그의 현재 시즌만 읽는다
+        leagues = get_registry().names()
+        if len(leagues) > 1:
+            st.session_state.league = st.sidebar.selectbox("League", leagues)
+        else:
+            st.session_state.league = None
         if st.session_state.role == "admin":
-            page = st.sidebar.radio("Go to", ["Tennis Ranking", "Admin Page", "Logout"])
+            page = st.sidebar.radio("Go to", ["Tennis Ranking", "Statistics", "Admin Page", "Logout"])
         else:
-            page = st.sidebar.radio("Go to", ["Tennis Ranking", "Logout"])
+            page = st.sidebar.radio("Go to", ["Tennis Ranking", "Statistics", "Logout"])
+        metrics.label(page)
 
         if page == "Tennis Ranking":
+            from tennis_ranking import tennis_ranking_page
             tennis_ranking_page()
+        elif page == "Statistics":
+            from pages import statistics_page
+            statistics_page.statistics_page()
         elif page == "Admin Page" and st.session_state.role == "admin":
             from pages import admin_page
             admin_page.admin_page()
@@ -38,4 +52,14 @@ if 'logged_in' not in st.session_state:
 if 'role' not in st.session_state:
     st.session_state.role = None
 
-main()
+# 실행마다 구간별 시간을 잰다. 관리자가 요청하면 이번 실행을 cProfile 로도 잰다
+with metrics.run('Login', profile=st.session_state.pop('profile_next_run', False)) as run:
+    main()
+st.session_state.last_run = run
+# 세션의 첫 화면까지 걸린 시간 (time-to-first-render)
+if 'first_render_ms' not in st.session_state:
+    st.session_state.first_render_ms = run['total'] * 1000
+    metrics.observe('session.first_render', run['total'])
+if run['profile'] is not None:
+    with st.expander('Profile of this run', expanded=True):
+        st.code(run['profile'])
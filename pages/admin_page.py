@@ -1,9 +1,49 @@
 import streamlit as st
 import pandas as pd
-from login import load_users_from_excel, save_users_to_excel
+from login import load_users, update_user, delete_user
+from ktp import api
+from ktp.cache import ranking_cache
+from ktp.leagues import get_registry
+from ktp.metrics import metrics
+from ktp.screenshots import get_screenshot_store
+
+SCREENSHOTS_PER_PAGE = 12
+
+# 구간별 실행 시간. 이 세션의 직전 실행, 프로세스 전체 누적, 최근 실행 목록
+def metrics_panel():
+    st.subheader('Metrics')
+    last_run = st.session_state.get('last_run')
+    if last_run is not None:
+        st.write(f"Previous run: {last_run['label']}, {last_run['total'] * 1000:.1f} ms")
+        st.dataframe(pd.DataFrame(
+            [{'Span': '  ' * depth + name, 'ms': round(elapsed * 1000, 2)}
+             for name, depth, elapsed in last_run['spans']],
+            columns=['Span', 'ms'],
+        ), hide_index=True)
+        if last_run['counters']:
+            st.caption(', '.join(f'{name}: {n}' for name, n in last_run['counters'].items()))
+
+    snapshot = metrics.snapshot()
+    totals = pd.DataFrame(
+        [{'Span': name, 'Calls': n, 'Total ms': total * 1000, 'Mean ms': total * 1000 / n, 'Max ms': longest * 1000}
+         for name, (n, total, longest) in snapshot['spans'].items()],
+        columns=['Span', 'Calls', 'Total ms', 'Mean ms', 'Max ms'],
+    )
+    st.dataframe(totals.sort_values('Total ms', ascending=False).round(2), hide_index=True)
+    recent = [{'Page': r['label'], 'Started': r['started_at'], 'ms': round(r['total'] * 1000, 1)}
+              for r in snapshot['runs'][::-1]]
+    st.dataframe(pd.DataFrame(recent, columns=['Page', 'Started', 'ms']), hide_index=True)
+
+    col1, col2 = st.columns(2)
+    col1.download_button('Download Prometheus Metrics', metrics.prometheus(), file_name='ktp_metrics.prom',
+                         mime='text/plain')
+    # 다음 실행 하나를 cProfile 로 재고 결과를 페이지 아래에 보여준다
+    if col2.button('Profile Next Rerun'):
+        st.session_state.profile_next_run = True
+        st.experimental_rerun()
 
 def admin_page():
-    users_df = load_users_from_excel()
+    users_df = load_users()
 
     st.title('Admin Page')
     pending_users = users_df[users_df['Approved'] == False]
@@ -12,38 +52,83 @@ def admin_page():
         for index, user in pending_users.iterrows():
             st.write(f"Username: {user['Username']}, Role: {user['Role']}")
             if st.button(f'Approve {user["Username"]}', key=f'approve_{user["UserID"]}'):
-                users_df.at[index, 'Approved'] = True
-                save_users_to_excel(users_df)
-                st.success(f'User {user["Username"]} approved')
+                if update_user(user['UserID'], lambda u: dict(u, Approved=True)) is not None:
+                    st.success(f'User {user["Username"]} approved')
+                else:
+                    st.error(f'User {user["Username"]} no longer exists')
 
     st.subheader('Update Role')
     username_to_update = st.selectbox('Select User', users_df['UserID'])
     new_role = st.selectbox('Select Role', ['admin', 'user', 'guest'])
     if st.button('Update Role'):
-        users_df.loc[users_df['UserID'] == username_to_update, 'Role'] = new_role
-        save_users_to_excel(users_df)
-        st.success(f'User {username_to_update} role updated to {new_role}')
+        if update_user(username_to_update, lambda u: dict(u, Role=new_role)) is not None:
+            st.success(f'User {username_to_update} role updated to {new_role}')
+        else:
+            st.error(f'User {username_to_update} no longer exists')
 
     st.subheader('Delete User')
     user_to_delete = st.selectbox('Select User to Delete', users_df['UserID'])
     if st.button('Delete User'):
-        users_df = users_df[users_df['UserID'] != user_to_delete]
-        save_users_to_excel(users_df)
+        delete_user(user_to_delete)
         st.success(f'User {user_to_delete} deleted')
 
+    st.subheader('Leagues')
+    registry = get_registry()
+    league = registry.get(st.session_state.get('league'))
+    st.write(f"Current: {league['title']} ({league['league']}), season {league['season']}")
+    col1, col2 = st.columns(2)
+    new_league = col1.text_input('New League Name')
+    new_title = col2.text_input('New League Title')
+    if st.button('Create League'):
+        try:
+            api.create_league(new_league, new_title or None)
+            st.success(f'League {new_league} created')
+        except ValueError as e:
+            st.error(str(e))
+    # 시즌 종료는 되돌릴 수 없으므로 한 번 더 확인한다
+    confirm = st.checkbox(f"End season {league['season']} of {league['league']} and start a new one")
+    if st.button('Start New Season', disabled=not confirm):
+        try:
+            season = api.rollover_season(league['league'])
+            st.success(f'Season {season} started')
+        except ValueError as e:
+            st.error(str(e))
+    ended = [s['season'] for s in registry.seasons(league['league']) if s['ended_at']]
+    if ended:
+        season = st.selectbox('Past Season Standings', ended[::-1])
+        st.dataframe(pd.DataFrame(registry.standings(league['league'], season)), hide_index=True)
+
+    st.subheader('Ranking Cache')
+    cache_stats = ranking_cache.stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric('Hits', cache_stats['hits'])
+    col2.metric('Misses', cache_stats['misses'])
+    col3.metric('Hit Rate', f"{cache_stats['hit_rate']:.0%}")
+
+    metrics_panel()
+
     # Screenshot upload section
     st.subheader('Upload Screenshot')
+    screenshots = get_screenshot_store()
     uploaded_file = st.file_uploader("Choose a file", type=["jpg", "jpeg", "png"])
-    if uploaded_file is not None:
-        with open(f"screenshots/{uploaded_file.name}", "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        st.success("File uploaded successfully")
+    # 업로더는 다시 실행될 때마다 같은 파일을 돌려주므로 한 번만 저장한다
+    if uploaded_file is not None and st.session_state.get('saved_upload') != uploaded_file.file_id:
+        try:
+            uploaded_file.seek(0)
+            _, created = screenshots.save(uploaded_file.name, uploaded_file)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.session_state.saved_upload = uploaded_file.file_id
+            st.success("File uploaded successfully" if created else "This screenshot was already uploaded")
 
-    # Display all uploaded screenshots
+    # 썸네일만 페이지 단위로 보여준다
     st.subheader('Uploaded Screenshots')
-    import os
-    if not os.path.exists("screenshots"):
-        os.makedirs("screenshots")
-    screenshots = os.listdir("screenshots")
-    for screenshot in screenshots:
-        st.image(f"screenshots/{screenshot}")
+    total = screenshots.count()
+    pages = max(1, -(-total // SCREENSHOTS_PER_PAGE))
+    page = st.number_input('Page', min_value=1, max_value=pages, value=1, step=1) if pages > 1 else 1
+    columns = st.columns(4)
+    for i, record in enumerate(screenshots.page(page, SCREENSHOTS_PER_PAGE)):
+        columns[i % 4].image(screenshots.thumbnail_path(record), caption=record['Uploaded At'],
+                             use_column_width=True)
+    st.caption(f'{total} screenshots, page {page} / {pages}')
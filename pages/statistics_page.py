@@ -0,0 +1,50 @@
+import streamlit as st
+import pandas as pd
+from ktp.leaderboard import get_leaderboard
+
+# 승률 컬럼 추가
+def with_win_rate(df):
+    played = df['Wins'] + df['Losses'] + df['Draws']
+    df['Win Rate'] = (df['Wins'] / played).map('{:.0%}'.format)
+    return df
+
+# 연승/연패 표시 (W3, L2)
+def streak_label(streak):
+    if streak > 0:
+        return f'W{streak}'
+    if streak < 0:
+        return f'L{-streak}'
+    return '-'
+
+# 플레이어별 통계 페이지. 미리 계산된 통계 테이블만 읽는다
+def statistics_page():
+    board = get_leaderboard(st.session_state.get('league'))
+    board.refresh()
+    storage = board.storage
+
+    st.title('Statistics')
+    player = st.selectbox('Player', board.names())
+    stats = storage.get_player_stats(player) if player else None
+    if not stats or not stats['Matches']:
+        st.info('No recorded matches yet.')
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric('Matches', stats['Matches'])
+    col2.metric('Win Rate', f"{stats['Wins'] / stats['Matches']:.0%}")
+    col3.metric('Streak', streak_label(stats['Streak']))
+    col4.metric('Best Streak', stats['Best Streak'])
+    st.write(f"Recent form: {' '.join(stats['Form'])}  (last played {stats['Last Played'][:10]})")
+
+    st.subheader('Ranking Points')
+    history = storage.load_rating_history(player)
+    history['Played At'] = pd.to_datetime(history['Played At'])
+    st.line_chart(history, x='Played At', y='Ranking Points')
+
+    st.subheader('Head to Head')
+    st.dataframe(with_win_rate(storage.load_head_to_head(player)), hide_index=True)
+
+    partners = storage.load_partners(player)
+    if not partners.empty:
+        st.subheader('Doubles Partners')
+        st.dataframe(with_win_rate(partners), hide_index=True)
@@ -1,288 +1,185 @@
-import pandas as pd
 import streamlit as st
-import base64
-import os
+from ktp.elo import CHAMPIONSHIP_POINTS
+from ktp.events import DELETABLE_KINDS, joined_timestamp, match_timestamp
+from ktp.cache import ranking_cache
+from ktp.leaderboard import get_leaderboard
+from ktp.leagues import get_registry
+from ktp.metrics import span
+from ktp.screenshots import get_screenshot_store
 
-def tennis_ranking_page():
-    def initialize_users():
-        df = pd.DataFrame(columns=['Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships', 'Guest'])
-        return df
-
-    def calculate_elo(winner_rp, loser_rp):
-        k = 32
-        expected_winner = 1 / (1 + 10 ** ((loser_rp - winner_rp) / 400))
-        expected_loser = 1 / (1 + 10 ** ((winner_rp - loser_rp) / 400))
-
-        winner_new_rp = int(winner_rp + k * (1 - expected_winner))
-        loser_new_rp = int(loser_rp + k * (0 - expected_loser))
-
-        return winner_new_rp, loser_new_rp
-
-    def calculate_double_elo(winner_rps, loser_rps):
-        k = 32
-        avg_winner_rp = sum(winner_rps) / 2
-        avg_loser_rp = sum(loser_rps) / 2
-
-        expected_winner = 1 / (1 + 10 ** ((avg_loser_rp - avg_winner_rp) / 400))
-        expected_loser = 1 / (1 + 10 ** ((avg_winner_rp - avg_loser_rp) / 400))
-
-        winner_new_rps = [int(rp + k * (1 - expected_winner)) for rp in winner_rps]
-        loser_new_rps = [int(rp + k * (0 - expected_loser)) for rp in loser_rps]
-
-        return winner_new_rps, loser_new_rps
-
-    def update_scores(df, winner, loser):
-        winner_index = df[df['Player'] == winner].index[0]
-        loser_index = df[df['Player'] == loser].index[0]
-
-        df.at[winner_index, 'Wins'] += 1
-        df.at[loser_index, 'Losses'] += 1
-
-        new_rp_winner, new_rp_loser = calculate_elo(df.at[winner_index, 'Ranking Points'], df.at[loser_index, 'Ranking Points'])
-
-        df.at[winner_index, 'Ranking Points'] = new_rp_winner
-        df.at[loser_index, 'Ranking Points'] = new_rp_loser
-
-        return df
-
-    def update_double_scores(df, winner_team, loser_team):
-        winner_indices = [df[df['Player'] == player].index[0] for player in winner_team]
-        loser_indices = [df[df['Player'] == player].index[0] for player in loser_team]
-
-        for idx in winner_indices:
-            df.at[idx, 'Wins'] += 1
-        for idx in loser_indices:
-            df.at[idx, 'Losses'] += 1
-
-        winner_rps = [df.at[idx, 'Ranking Points'] for idx in winner_indices]
-        loser_rps = [df.at[idx, 'Ranking Points'] for idx in loser_indices]
+PAGE_SIZES = [25, 50, 100]
 
-        new_winner_rps, new_loser_rps = calculate_double_elo(winner_rps, loser_rps)
-
-        for idx, new_rp in zip(winner_indices, new_winner_rps):
-            df.at[idx, 'Ranking Points'] = new_rp
-        for idx, new_rp in zip(loser_indices, new_loser_rps):
-            df.at[idx, 'Ranking Points'] = new_rp
-
-        return df
-
-    def save_to_excel(df, filename='league_of_ktp.xlsx'):
-        df.to_excel(filename, index=False)
-
-    def load_from_excel(filename='league_of_ktp.xlsx'):
+def tennis_ranking_page():
+    league = get_registry().get(st.session_state.get('league'))
+    board = get_leaderboard(league['league'])
+
+    # 순위 한 페이지만 만들고 시작 위치, 전체 행 수와 같이 돌려준다. 검색은 이름 앞부분으로 찾고,
+    # 찾은 플레이어 중 start 번째부터 보여준다. start 가 전체보다 뒤면 마지막 행부터 보여준다.
+    # 첫 페이지는 데이터 버전이 같으면 같은 리그를 보는 모든 세션이 같이 쓰므로 결과를 수정하면 안 된다
+    def ranking_page(start, size, query):
+        version = board.refresh()
+        if query:
+            total, rows = board.search(query, start, size)
+            if not rows and total:
+                start = total - 1
+                rows = board.search(query, start, size)[1]
+            return start, total, *board.table(rows)
+        total = board.count()
+        start = min(start, max(total - 1, 0))
+        if start == 0:
+            return start, total, *ranking_cache.get(('ranking', board.storage.path, size), version,
+                                                    lambda: board.build_page(0, size))
+        return start, total, *board.build_page(start, size)
+
+    # 다른 관리자가 먼저 바꾼 경우(이미 추가/삭제된 플레이어 등) 오류로 보여준다
+    def record(kind, players, value=0, played_at=None):
         try:
-            df = pd.read_excel(filename)
-            if 'Guest' not in df.columns:
-                df['Guest'] = False
-        except FileNotFoundError:
-            df = initialize_users()
-        return df
-
-    def b64_image(filename):
-        with open(filename, "rb") as f:
-            return base64.b64encode(f.read()).decode()
-
-    def add_crown_icons(ranking_df):
-        gold_crown = f'<img src="data:image/png;base64,{b64_image("gold_crown.png")}" width="16" height="16"/>'
-        silver_crown = f'<img src="data:image/png;base64,{b64_image("silver_crown.png")}" width="16" height="16"/>'
-        bronze_crown = f'<img src="data:image/png;base64,{b64_image("bronze_crown.png")}" width="16" height="16"/>'
-
-        if len(ranking_df) > 0:
-            ranking_df.at[0, 'Player'] += f' {gold_crown}'
-        if len(ranking_df) > 1:
-            ranking_df.at[1, 'Player'] += f' {silver_crown}'
-        if len(ranking_df) > 2:
-            ranking_df.at[2, 'Player'] += f' {bronze_crown}'
+            board.record(kind, players, value, played_at)
+        except ValueError as e:
+            st.error(str(e))
+            return False
+        return True
 
-        return ranking_df
-
-    def render_html_table(df):
-        df.rename(columns={'index': 'Rank'}, inplace=True)
-        html = df.to_html(escape=False, index=False)
-        return html
-
-    st.title('League of KTP')
-
-    df = load_from_excel()
+    st.title(league['title'])
+    if league['season'] > 1:
+        st.caption(f"Season {league['season']}")
 
     st.header('Player Rankings')
-    ranking_df = df[df['Guest'] == False].sort_values(by='Ranking Points', ascending=False).reset_index(drop=True)
-    ranking_df = add_crown_icons(ranking_df)
-    ranking_df.index = ranking_df.index + 1
-    ranking_df.index.name = 'Rank'
-    guest_df = df[df['Guest'] == True].sort_values(by='Player').reset_index(drop=True)
-    guest_df.index = ['G' + str(i+1) for i in range(len(guest_df))]
-    combined_df = pd.concat([ranking_df, guest_df]).reset_index()
-    combined_df.rename(columns={'index': 'Rank'}, inplace=True)
-    html_table = render_html_table(combined_df[['Rank', 'Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships']])
-    st.markdown(html_table, unsafe_allow_html=True)
+    col1, col2, col3 = st.columns([2, 1, 1])
+    query = col1.text_input('Search Player').strip()
+    page_size = col2.selectbox('Rows per Page', PAGE_SIZES)
+    from_rank = col3.number_input('From Rank', min_value=1, value=1, step=page_size)
+    # 관리자 입력을 먼저 처리하고 표는 마지막에 한 번만 그린다
+    table_slot = st.empty()
+    caption_slot = st.empty()
 
     st.header('Next Match')
-    screenshots = sorted(os.listdir("screenshots"), reverse=True)
-    if screenshots:
-        st.image(f"screenshots/{screenshots[0]}", use_column_width='auto')
+    screenshots = get_screenshot_store()
+    with span('render.next_match'):
+        latest = screenshots.latest()
+        if latest is not None:
+            st.image(screenshots.path(latest), use_column_width='auto')
 
     if st.session_state.role == 'admin':
+        board.refresh()
+        players = board.names()
+
         st.header('Record a Match Result')
+        match_date = st.date_input('Match Date')
         match_type = st.radio('Match Type', ['Single', 'Double'])
 
         if match_type == 'Single':
             col1, col2, col3 = st.columns(3)
 
             with col1:
-                player1 = st.selectbox('Player 1', df['Player'])
+                player1 = st.selectbox('Player 1', players)
             with col2:
-                player2 = st.selectbox('Player 2', df['Player'])
+                player2 = st.selectbox('Player 2', players)
             with col3:
                 result = st.selectbox('Winner', ['player1', 'player2', 'draw'])
 
             if st.button('Submit Result'):
                 if player1 != player2:
                     if result == 'player1':
-                        df = update_scores(df, player1, player2)
+                        recorded = record('single', [player1, player2], played_at=match_timestamp(match_date))
                     elif result == 'player2':
-                        df = update_scores(df, player2, player1)
-                    save_to_excel(df)
-                    df = load_from_excel()
-                    ranking_df = df[df['Guest'] == False].sort_values(by='Ranking Points', ascending=False).reset_index(drop=True)
-                    ranking_df = add_crown_icons(ranking_df)
-                    ranking_df.index = ranking_df.index + 1
-                    ranking_df.index.name = 'Rank'
-                    guest_df = df[df['Guest'] == True].sort_values(by='Player').reset_index(drop=True)
-                    guest_df.index = ['G' + str(i+1) for i in range(len(guest_df))]
-                    combined_df = pd.concat([ranking_df, guest_df]).reset_index()
-                    combined_df.rename(columns={'index': 'Rank'}, inplace=True)
-                    html_table = render_html_table(combined_df[['Rank', 'Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships']])
-                    st.markdown(html_table, unsafe_allow_html=True)
-                    st.success(f'{player1} vs {player2} 경기 결과 기록 완료.')
+                        recorded = record('single', [player2, player1], played_at=match_timestamp(match_date))
+                    else:
+                        recorded = record('draw', [player1, player2], played_at=match_timestamp(match_date))
+                    if recorded:
+                        st.success(f'{player1} vs {player2} 경기 결과 기록 완료.')
                 else:
                     st.error('두 플레이어는 동일할 수 없습니다.')
         
         elif match_type == 'Double':
             col1, col2 = st.columns(2)
             with col1:
-                team_a_player1 = st.selectbox('Team A - Player 1', df['Player'])
-                team_a_player2 = st.selectbox('Team A - Player 2', df['Player'])
+                team_a_player1 = st.selectbox('Team A - Player 1', players)
+                team_a_player2 = st.selectbox('Team A - Player 2', players)
             with col2:
-                team_b_player1 = st.selectbox('Team B - Player 1', df['Player'])
-                team_b_player2 = st.selectbox('Team B - Player 2', df['Player'])
+                team_b_player1 = st.selectbox('Team B - Player 1', players)
+                team_b_player2 = st.selectbox('Team B - Player 2', players)
             
             result = st.selectbox('Winner', ['Team A', 'Team B', 'Draw'])
             
             if st.button('Submit Double Result'):
                 if len(set([team_a_player1, team_a_player2, team_b_player1, team_b_player2])) == 4:
                     if result == 'Team A':
-                        df = update_double_scores(df, [team_a_player1, team_a_player2], [team_b_player1, team_b_player2])
+                        recorded = record('double', [team_a_player1, team_a_player2, team_b_player1, team_b_player2], played_at=match_timestamp(match_date))
                     elif result == 'Team B':
-                        df = update_double_scores(df, [team_b_player1, team_b_player2], [team_a_player1, team_a_player2])
-                    save_to_excel(df)
-                    df = load_from_excel()
-                    ranking_df = df[df['Guest'] == False].sort_values(by='Ranking Points', ascending=False).reset_index(drop=True)
-                    ranking_df = add_crown_icons(ranking_df)
-                    ranking_df.index = ranking_df.index + 1
-                    ranking_df.index.name = 'Rank'
-                    guest_df = df[df['Guest'] == True].sort_values(by='Player').reset_index(drop=True)
-                    guest_df.index = ['G' + str(i+1) for i in range(len(guest_df))]
-                    combined_df = pd.concat([ranking_df, guest_df]).reset_index()
-                    combined_df.rename(columns={'index': 'Rank'}, inplace=True)
-                    html_table = render_html_table(combined_df[['Rank', 'Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships']])
-                    st.markdown(html_table, unsafe_allow_html=True)
-                    st.success('Double match result recorded successfully.')
+                        recorded = record('double', [team_b_player1, team_b_player2, team_a_player1, team_a_player2], played_at=match_timestamp(match_date))
+                    else:
+                        recorded = record('draw', [team_a_player1, team_a_player2, team_b_player1, team_b_player2], played_at=match_timestamp(match_date))
+                    if recorded:
+                        st.success('Double match result recorded successfully.')
                 else:
                     st.error('Each player should be unique in a double match.')
 
         st.header('Add New Player')
         new_player = st.text_input('Player Name')
+        # 이 날짜부터의 경기에 넣을 수 있다. 지난 경기를 기록하려면 그 이전 날짜로 추가한다
+        joined_on = st.date_input('Joined On')
 
         if st.button('Add Player'):
-            if new_player and new_player not in df['Player'].values:
-                new_data = pd.DataFrame([[new_player, 1000, 0, 0, 0, 0, False]], columns=['Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships', 'Guest'])
-                df = pd.concat([df, new_data], ignore_index=True)
-                save_to_excel(df)
-                df = load_from_excel()
-                ranking_df = df[df['Guest'] == False].sort_values(by='Ranking Points', ascending=False).reset_index(drop=True)
-                ranking_df = add_crown_icons(ranking_df)
-                ranking_df.index = ranking_df.index + 1
-                ranking_df.index.name = 'Rank'
-                guest_df = df[df['Guest'] == True].sort_values(by='Player').reset_index(drop=True)
-                guest_df.index = ['G' + str(i+1) for i in range(len(guest_df))]
-                combined_df = pd.concat([ranking_df, guest_df]).reset_index()
-                combined_df.rename(columns={'index': 'Rank'}, inplace=True)
-                html_table = render_html_table(combined_df[['Rank', 'Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships']])
-                st.markdown(html_table, unsafe_allow_html=True)
-                st.success(f'플레이어 {new_player} 추가 완료.')
+            if new_player and new_player not in players:
+                if record('add', [new_player], False, joined_timestamp(joined_on)):
+                    players = board.names()
+                    st.success(f'플레이어 {new_player} 추가 완료.')
             else:
                 st.error('플레이어 이름을 입력하거나 이미 존재하는 플레이어입니다.')
 
         st.header('Record a Championship Win')
-        champion = st.selectbox('Champion', df['Player'])
+        champion = st.selectbox('Champion', players)
 
         if st.button('Submit Championship Win'):
-            champ_index = df[df['Player'] == champion].index[0]
-            df.at[champ_index, 'Championships'] += 1
-            df.at[champ_index, 'Ranking Points'] += 50  # 챔피언십 포인트 추가
-            save_to_excel(df)
-            df = load_from_excel()
-            ranking_df = df[df['Guest'] == False].sort_values(by='Ranking Points', ascending=False).reset_index(drop=True)
-            ranking_df = add_crown_icons(ranking_df)
-            ranking_df.index = ranking_df.index + 1
-            ranking_df.index.name = 'Rank'
-            guest_df = df[df['Guest'] == True].sort_values(by='Player').reset_index(drop=True)
-            guest_df.index = ['G' + str(i+1) for i in range(len(guest_df))]
-            combined_df = pd.concat([ranking_df, guest_df]).reset_index()
-            combined_df.rename(columns={'index': 'Rank'}, inplace=True)
-            html_table = render_html_table(combined_df[['Rank', 'Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships']])
-            st.markdown(html_table, unsafe_allow_html=True)
-            st.success(f'{champion}의 우승 횟수가 추가되고 100 랭킹 포인트가 추가되었습니다.')
+            if record('championship', [champion], CHAMPIONSHIP_POINTS):  # 챔피언십 포인트 추가
+                st.success(f'{champion}의 우승 횟수가 추가되고 100 랭킹 포인트가 추가되었습니다.')
 
         st.header('Add Guest Player')
         new_guest = st.text_input('Guest Player Name')
 
         if st.button('Add Guest Player'):
-            if new_guest and new_guest not in df['Player'].values:
-                new_data = pd.DataFrame([[new_guest, 1000, 0, 0, 0, 0, True]], columns=['Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships', 'Guest'])
-                df = pd.concat([df, new_data], ignore_index=True)
-                save_to_excel(df)
-                df = load_from_excel()
-                ranking_df = df[df['Guest'] == False].sort_values(by='Ranking Points', ascending=False).reset_index(drop=True)
-                ranking_df = add_crown_icons(ranking_df)
-                ranking_df.index = ranking_df.index + 1
-                ranking_df.index.name = 'Rank'
-                guest_df = df[df['Guest'] == True].sort_values(by='Player').reset_index(drop=True)
-                guest_df.index = ['G' + str(i+1) for i in range(len(guest_df))]
-                combined_df = pd.concat([ranking_df, guest_df]).reset_index()
-                combined_df.rename(columns={'index': 'Rank'}, inplace=True)
-                html_table = render_html_table(combined_df[['Rank', 'Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships']])
-                st.markdown(html_table, unsafe_allow_html=True)
-                st.success(f'게스트 플레이어 {new_guest} 추가 완료.')
+            if new_guest and new_guest not in players:
+                if record('add', [new_guest], True):
+                    players = board.names()
+                    st.success(f'게스트 플레이어 {new_guest} 추가 완료.')
             else:
                 st.error('플레이어 이름을 입력하거나 이미 존재하는 플레이어입니다.')
 
         st.header('Delete Guest Player')
-        guest_to_delete = st.selectbox('Select Guest Player to Delete', df[df['Guest'] == True]['Player'])
+        guest_to_delete = st.selectbox('Select Guest Player to Delete', board.guest_names())
 
         if st.button('Delete Guest Player'):
             if guest_to_delete:
-                df = df[df['Player'] != guest_to_delete]
-                save_to_excel(df)
-                df = load_from_excel()
-                ranking_df = df[df['Guest'] == False].sort_values(by='Ranking Points', ascending=False).reset_index(drop=True)
-                ranking_df = add_crown_icons(ranking_df)
-                ranking_df.index = ranking_df.index + 1
-                ranking_df.index.name = 'Rank'
-                guest_df = df[df['Guest'] == True].sort_values(by='Player').reset_index(drop=True)
-                guest_df.index = ['G' + str(i+1) for i in range(len(guest_df))]
-                combined_df = pd.concat([ranking_df, guest_df]).reset_index()
-                combined_df.rename(columns={'index': 'Rank'}, inplace=True)
-                html_table = render_html_table(combined_df[['Rank', 'Player', 'Ranking Points', 'Wins', 'Losses', 'Draws', 'Championships']])
-                st.markdown(html_table, unsafe_allow_html=True)
-                st.success(f'게스트 플레이어 {guest_to_delete} 삭제 완료.')
+                if record('remove', [guest_to_delete]):
+                    players = board.names()
+                    st.success(f'게스트 플레이어 {guest_to_delete} 삭제 완료.')
             else:
                 st.error('게스트 플레이어를 선택하세요.')
-    else:
-        st.header('Player Rankings')
-        html_table = render_html_table(ranking_df[['Rank', 'Player', 'Ranking Points']])
-        st.markdown(html_table, unsafe_allow_html=True)
-        st.header('Next Match')
-        if screenshots:
-            st.image(f"screenshots/{screenshots[0]}", use_column_width='auto')
+
+        st.header('Match History')
+        events_df = board.storage.load_events(limit=20)
+        st.dataframe(events_df, hide_index=True)
+        # 경기 결과와 우승 기록만 지울 수 있다
+        deletable = events_df.loc[events_df['Kind'].isin(DELETABLE_KINDS), 'Seq']
+        event_to_delete = st.selectbox('Select Match to Delete', deletable)
+
+        if st.button('Delete Match'):
+            if event_to_delete:
+                try:
+                    board.delete_event(event_to_delete)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.success(f'기록 {event_to_delete} 삭제 완료. 이후 경기 결과를 다시 계산했습니다.')
+            else:
+                st.error('삭제할 기록을 선택하세요.')
+
+    start, total, table, html_table = ranking_page(int(from_rank) - 1, page_size, query)
+    with span('render.ranking_table'):
+        table_slot.markdown(html_table, unsafe_allow_html=True)
+    if query:
+        caption_slot.caption(f'{start + 1}-{start + len(table)} of {total} players starting with "{query}"'
+                             if total else f'No players starting with "{query}"')
+    elif total:
+        caption_slot.caption(f'Ranks {start + 1}-{start + len(table)} of {total} players')
@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from ktp.bulk_import import results_to_events, sheet_arg
+
+
+def test_results_to_events():
+    df = pd.DataFrame({
+        'Winner': ['A', 'A', 'C'], 'Loser': ['B', 'B', 'D'], 'Winner 2': [None, None, 'E'],
+        'Loser 2': [None, None, 'F'], 'Result': [None, 'draw', None], 'Date': ['2024-05-01', None, None],
+    })
+    assert results_to_events(df) == [
+        ('single', ['A', 'B'], 0, '2024-05-01T00:00:00'),
+        ('draw', ['A', 'B'], 0, None),
+        ('double', ['C', 'E', 'D', 'F'], 0, None),
+    ]
+
+
+# 빈 칸이 'nan' 이라는 플레이어가 되면 안 된다
+@pytest.mark.parametrize('winner', [None, '  '])
+def test_blank_names_are_rejected(winner):
+    df = pd.DataFrame({'Winner': ['A', winner], 'Loser': ['B', 'C']})
+    with pytest.raises(ValueError, match='Row 3'):
+        results_to_events(df)
+
+
+def test_sheet_arg():
+    assert sheet_arg('1') == 1
+    assert sheet_arg('Results') == 'Results'
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from ktp.events import apply_event, apply_matches_batch, new_player
+
+
+def random_batch(rng):
+    names = [f'p{i}' for i in range(rng.randint(2, 30))]
+    state = {}
+    for name in names:
+        state[name] = new_player()
+        state[name]['Ranking Points'] = rng.randint(0, 3000)
+    matches = []
+    for _ in range(rng.randint(1, 300)):
+        if len(names) >= 4 and rng.random() < 0.4:
+            players = rng.sample(names, 4)
+            kind = 'draw' if rng.random() < 0.1 else 'double'
+        else:
+            players = rng.sample(names, 2)
+            kind = 'draw' if rng.random() < 0.1 else 'single'
+        matches.append((kind, players))
+    return state, matches
+
+
+# 묶어서 계산한 결과가 경기마다 순서대로 계산한 결과와 1비트도 다르지 않아야 한다
+@pytest.mark.parametrize('seed', range(200))
+def test_batch_matches_sequential_elo(seed):
+    state, matches = random_batch(random.Random(seed))
+    sequential = {name: dict(row) for name, row in state.items()}
+    expected = []
+    for kind, players in matches:
+        apply_event(sequential, kind, players)
+        expected.append(None if kind == 'draw' else [sequential[p]['Ranking Points'] for p in players])
+
+    batched = {name: dict(row) for name, row in state.items()}
+    _, after = apply_matches_batch(batched, matches, history=True)
+    assert batched == sequential
+    assert [None if rps is None else list(rps) for rps in after] == expected
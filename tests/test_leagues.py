@@ -0,0 +1,50 @@
+import pytest
+
+from ktp.leagues import LeagueRegistry
+from ktp.storage import SQLiteStorage
+
+
+def make_registry(tmp_path):
+    registry = LeagueRegistry(SQLiteStorage(str(tmp_path / 'ktp.db')))
+    registry.create_league('club')
+    registry.storage_for('club').append_events([
+        ('add', ['A'], False, '2024-01-01T00:00:00'),
+        ('add', ['B'], False, '2024-01-01T00:00:00'),
+        ('single', ['A', 'B'], 0, '2024-01-02T00:00:00'),
+    ])
+    return registry
+
+
+def test_rollover_starts_new_season_from_initial_points(tmp_path):
+    registry = make_registry(tmp_path)
+    assert registry.rollover('club') == 2
+    assert registry.get('club')['season'] == 2
+    players = registry.storage_for('club').load_players()
+    assert sorted(players['Player']) == ['A', 'B']
+    assert set(players['Ranking Points']) == {1000}
+    assert [row['Player'] for row in registry.standings('club', 1)] == ['A', 'B']
+
+
+# 새 시즌 DB 를 채운 뒤 목록을 바꾸기 전에 실패해도 다시 실행하면 마저 끝난다
+def test_rollover_resumes_after_failed_registry_update(tmp_path, monkeypatch):
+    registry = make_registry(tmp_path)
+
+    def fail(*args):
+        raise RuntimeError('crash')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(registry.storage, 'start_season', fail)
+        with pytest.raises(RuntimeError):
+            registry.rollover('club')
+    assert registry.get('club')['season'] == 1
+
+    assert registry.rollover('club') == 2
+    assert sorted(registry.storage_for('club').load_players()['Player']) == ['A', 'B']
+
+
+def test_rollover_refuses_season_with_matches(tmp_path):
+    registry = make_registry(tmp_path)
+    new = registry._open(registry._partition_path('club', 2))
+    new.append_events([('add', ['C'], False, '2024-03-01T00:00:00')])
+    with pytest.raises(ValueError, match='already started'):
+        registry.rollover('club')
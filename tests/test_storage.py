@@ -0,0 +1,68 @@
+import random
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from ktp.elo import INITIAL_POINTS
+from ktp.events import SNAPSHOT_INTERVAL, joined_timestamp
+from ktp.storage import SQLiteStorage, Storage
+
+
+def make_storage(tmp_path, *names):
+    storage = SQLiteStorage(str(tmp_path / 'ktp.db'))
+    storage.append_events([('add', [name], False, '2024-01-01T00:00:00') for name in names])
+    return storage
+
+
+# 한 묶음 안에서 추가한 플레이어가 바로 무승부를 기록하는 경우
+def test_batch_draw_for_player_added_in_same_batch(tmp_path):
+    storage = make_storage(tmp_path, 'A')
+    storage.append_events([
+        ('add', ['X'], False, '2024-01-02T00:00:00'),
+        ('draw', ['X', 'A'], 0, '2024-01-02T00:00:01'),
+    ])
+    history = storage.load_rating_history('X')
+    assert list(history['Result']) == ['D']
+    assert list(history['Ranking Points']) == [INITIAL_POINTS]
+    assert storage.get_player_stats('X')['Draws'] == 1
+
+
+# 한 번에 넣은 경기도 SNAPSHOT_INTERVAL 개마다 스냅샷을 남기고, 그 범위의 과거 날짜 기록은 처음부터 계산한 결과와 같다
+def test_batch_saves_periodic_snapshots(tmp_path):
+    names = [f'p{i}' for i in range(20)]
+    storage = make_storage(tmp_path, *names)
+    rng = random.Random(0)
+    storage.append_events([
+        ('single', rng.sample(names, 2), 0, f'2024-02-01T{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}')
+        for i in range(2 * SNAPSHOT_INTERVAL + 10)
+    ])
+    snapshots = storage.connect().execute('SELECT COUNT(*) FROM snapshots WHERE seq != 0').fetchone()[0]
+    assert snapshots == 2
+
+    storage.append_event('single', ['p0', 'p1'], played_at='2024-02-01T00:30:00')
+    players = storage.load_players()
+    storage.rebuild()
+    pd.testing.assert_frame_equal(players, storage.load_players())
+
+
+# 다른 백엔드도 같은 메서드를 구현하도록, SQLite 연결을 다루는 메서드 말고는 모두 인터페이스에 있어야 한다
+def test_storage_interface_declares_public_methods():
+    sqlite_only = {'connect', 'transaction'}
+    public = {name for name in vars(SQLiteStorage) if not name.startswith('_') and callable(getattr(SQLiteStorage, name))}
+    assert public - sqlite_only - set(vars(Storage)) == set()
+
+
+# 오늘 추가한 플레이어를 지난주 경기에 넣으면 다시 계산하기 전에 가입 날짜를 알려 준다
+def test_backdated_match_before_player_joined(tmp_path):
+    storage = make_storage(tmp_path, 'A')
+    storage.append_event('add', ['New'], played_at='2024-03-10T12:00:00')
+    with pytest.raises(ValueError, match='New was added on 2024-03-10'):
+        storage.append_event('single', ['New', 'A'], played_at='2024-03-03T12:00:00')
+    with pytest.raises(ValueError, match='New was added on 2024-03-10'):
+        storage.append_events([('single', ['A', 'New'], 0, '2024-03-03T12:00:00')])
+    assert storage.load_events()['Kind'].tolist() == ['add', 'add']
+
+    storage.append_event('add', ['Early'], played_at=joined_timestamp(date(2024, 3, 3)))
+    storage.append_event('single', ['Early', 'A'], played_at='2024-03-03T12:00:00')
+    assert storage.get_player('Early')['Wins'] == 1